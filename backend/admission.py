@@ -0,0 +1,181 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+class AdmissionRejected(Exception):
+    """
+    Raised when an upstream call cannot be admitted within the queue limits.
+    """
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` calls per second with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one will be available
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+class AdmissionController:
+    """
+    Admission control for upstream LLM calls.
+
+    At most max_concurrency calls run at once, optionally limited to a
+    token-bucket rate. Callers over capacity wait in a queue of at most
+    max_queue callers for at most max_wait seconds; beyond either limit they
+    are rejected immediately with AdmissionRejected.
+
+    With a shared-state backend and shared_rate, calls are also limited to
+    shared_rate per second across every worker using that backend.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_queue: int = 100,
+        max_wait: float = 2.0,
+        state=None,
+        shared_rate: Optional[float] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.state = state
+        self.shared_rate = shared_rate if state is not None else None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate, burst or max(1, int(rate))) if rate else None
+        self._waiting = 0
+        self._running = 0
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.rejected_shared_rate = 0
+        self.rejected_no_wait = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @asynccontextmanager
+    async def slot(self, max_wait: Optional[float] = None):
+        """
+        Hold one upstream call slot for the duration of the block.
+
+        Args:
+            max_wait: Shorter limit on the wait for this call, such as the
+                caller's remaining latency budget; 0 takes a slot only if one is
+                free right now and never queues
+
+        Raises:
+            AdmissionRejected: If the wait queue is full, no slot is free with
+                max_wait=0, or the wait limit elapses
+        """
+        started = time.monotonic()
+        wait = self.max_wait if max_wait is None else max(min(max_wait, self.max_wait), 0.0)
+        if self._take_free_capacity():
+            # Does not suspend: a slot is free and nobody is queued ahead of us
+            await self._semaphore.acquire()
+        else:
+            if wait == 0:
+                self.rejected_no_wait += 1
+                raise AdmissionRejected("No upstream capacity free", retry_after=self.max_wait)
+            if self._waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected("Upstream wait queue is full", retry_after=self.max_wait)
+
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._acquire(), timeout=wait)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejected("Timed out waiting for upstream capacity", retry_after=self.max_wait)
+            finally:
+                self._waiting -= 1
+
+        if self.shared_rate:
+            try:
+                await self._wait_shared_rate(started + wait)
+            except BaseException:
+                self._semaphore.release()
+                raise
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+    def _take_free_capacity(self) -> bool:
+        # Callers only queue when there is no free slot or token right now
+        if self._semaphore.locked() or self._waiting:
+            return False
+        return self._bucket is None or self._bucket.try_acquire() == 0
+
+    async def _acquire(self) -> None:
+        await self._semaphore.acquire()
+        try:
+            while self._bucket is not None:
+                delay = self._bucket.try_acquire()
+                if delay == 0:
+                    break
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def _wait_shared_rate(self, deadline: float) -> None:
+        # Count this call in the cluster-wide one-second window; while the
+        # window is over budget, wait for the next one until the deadline
+        while True:
+            count, window_left = await self.state.incr("llm-rate", 1.0)
+            if count <= self.shared_rate:
+                return
+            if time.monotonic() + window_left > deadline:
+                self.rejected_shared_rate += 1
+                raise AdmissionRejected("Shared upstream rate limit reached", retry_after=window_left)
+            await asyncio.sleep(window_left)
+
+    def stats(self) -> dict:
+        """
+        Return queue depth, in-flight calls, wait-time and rejection counters.
+        """
+        return {
+            "in_flight": self._running,
+            "queue_depth": self._waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "rejected_shared_rate": self.rejected_shared_rate,
+            "rejected_no_wait": self.rejected_no_wait,
+            "avg_wait_seconds": self.wait_total / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.wait_max
+        }
\ No newline at end of file
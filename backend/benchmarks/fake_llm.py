@@ -0,0 +1,165 @@
+"""
+Local stand-in for the emergentintegrations LLM SDK, used by the benchmarks.
+
+install() registers fake `emergentintegrations.llm.chat` and `litellm` modules
+(litellm serves the streamed completions), so the real server code paths
+(LlmClient, admission, breaker, pool, batching) run unchanged against an
+upstream with a configurable latency and error distribution.
+"""
+import asyncio
+import json
+import random
+import re
+import sys
+import types
+from typing import Optional
+
+class FakeLlmConfig:
+    """
+    Latency and error distribution of the fake upstream.
+
+    Latencies are log-normal around latency_median seconds (latency_sigma=0
+    makes them constant); error_rate is the fraction of calls that raise.
+    Streaming responses are split into words, with time_to_first_token before
+    the first one and the rest of the latency spread across the others.
+    """
+
+    def __init__(
+        self,
+        latency_median: float = 0.5,
+        latency_sigma: float = 0.3,
+        error_rate: float = 0.0,
+        time_to_first_token: float = 0.15,
+        seed: Optional[int] = None
+    ):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.time_to_first_token = time_to_first_token
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    def latency(self) -> float:
+        if self.latency_sigma <= 0:
+            return self.latency_median
+        return self.random.lognormvariate(0, self.latency_sigma) * self.latency_median
+
+    def should_fail(self) -> bool:
+        return self.random.random() < self.error_rate
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors}
+
+config = FakeLlmConfig()
+
+# Per-backend configs keyed by "provider/model"; other backends use `config`
+backends: dict[str, FakeLlmConfig] = {}
+
+class UserMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+class LlmChat:
+    """
+    Mirrors the LlmChat surface the backend uses: with_model and send_message.
+    """
+
+    def __init__(self, api_key: str, session_id: str, system_message: str, initial_messages=None):
+        self.system_message = system_message
+        self.provider = "openai"
+        self.model = "gpt-4o-mini"
+
+    def with_model(self, provider: str, model: str) -> "LlmChat":
+        self.provider = provider
+        self.model = model
+        return self
+
+    @property
+    def config(self) -> FakeLlmConfig:
+        return backends.get(f"{self.provider}/{self.model}", config)
+
+    async def send_message(self, message: UserMessage) -> str:
+        await self._begin(self.config.latency())
+        return self._reply(message.text)
+
+    async def stream_reply(self, text: str):
+        latency = self.config.latency()
+        await self._begin(min(self.config.time_to_first_token, latency))
+        words = self._reply(text).split(" ")
+        remaining = max(latency - self.config.time_to_first_token, 0)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(remaining / len(words))
+            yield word if i == 0 else " " + word
+
+    async def _begin(self, delay: float) -> None:
+        self.config.calls += 1
+        await asyncio.sleep(delay)
+        if self.config.should_fail():
+            self.config.errors += 1
+            raise RuntimeError("Fake upstream error")
+
+    def _reply(self, text: str) -> str:
+        batch = re.match(r"Generate (\d+) motivational messages", text)
+        if batch:
+            return json.dumps([self._message() for _ in range(int(batch.group(1)))])
+        return self._message()
+
+    def _message(self) -> str:
+        return f"You are doing better than you think, one step at a time. #{self.config.random.randrange(10 ** 6)}"
+
+async def acompletion(model: str, messages: list, stream: bool = False, **kwargs):
+    """
+    Mirrors litellm.acompletion for the streamed calls LlmClient makes directly.
+    """
+    provider, _, name = model.partition("/")
+    chat = LlmChat(kwargs.get("api_key", ""), "", messages[0]["content"]).with_model(provider, name)
+    if not stream:
+        raise NotImplementedError("The fake litellm only streams")
+
+    async def chunks():
+        async for text in chat.stream_reply(messages[-1]["content"]):
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+    return chunks()
+
+def install(
+    fake_config: Optional[FakeLlmConfig] = None,
+    backend_configs: Optional[dict[str, FakeLlmConfig]] = None,
+    modules: Optional[dict] = None
+) -> FakeLlmConfig:
+    """
+    Register the fake SDK modules in sys.modules, replacing any real ones.
+
+    Args:
+        fake_config: Behaviour of every backend without its own config
+        backend_configs: Behaviour per "provider/model", to fake several providers
+        modules: Mapping to register the modules in instead of sys.modules
+
+    Returns:
+        The active FakeLlmConfig, whose counters the benchmark reports
+    """
+    global config
+    if fake_config is not None:
+        config = fake_config
+    if backend_configs is not None:
+        backends.clear()
+        backends.update(backend_configs)
+
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = LlmChat
+    chat.UserMessage = UserMessage
+    llm = types.ModuleType("emergentintegrations.llm")
+    llm.chat = chat
+    package = types.ModuleType("emergentintegrations")
+    package.llm = llm
+    litellm = types.ModuleType("litellm")
+    litellm.acompletion = acompletion
+    litellm.aclient_session = None
+    (sys.modules if modules is None else modules).update({
+        "emergentintegrations": package,
+        "emergentintegrations.llm": llm,
+        "emergentintegrations.llm.chat": chat,
+        "litellm": litellm
+    })
+    return config
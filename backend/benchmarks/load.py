@@ -0,0 +1,374 @@
+"""
+Load and latency benchmark for the MoodMate backend.
+
+Drives concurrent generate / save / list traffic against the app and reports
+throughput and latency percentiles per endpoint as JSON, so each performance
+change can be compared against a saved baseline run.
+
+By default the app runs in-process behind an ASGI transport, with the LLM
+replaced by benchmarks.fake_llm (configurable latency and error rate) and
+MongoDB replaced by mongomock-motor. Pass --target to drive a server over
+HTTP instead; `--serve PORT` starts such a server with the same fakes.
+
+Usage (from backend/):
+    python -m benchmarks.load --duration 10 --concurrency 32 --output base.json
+    python -m benchmarks.load --duration 10 --concurrency 32 --compare base.json
+    python -m benchmarks.load --serve 8001 &
+    python -m benchmarks.load --target http://127.0.0.1:8001
+
+The server's own settings (MESSAGE_POOL_ENABLED, RESPONSE_CACHE, ...) are read
+from the environment as usual. In-process runs also report the event-loop lag
+(how late a 5 ms sleep wakes up), e.g. to compare logging modes:
+    LOG_ASYNC=false python -m benchmarks.load --log-file /tmp/sync.log
+    LOG_ASYNC=true python -m benchmarks.load --log-file /tmp/queued.log
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks import fake_llm
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+EMOTIONS = ["Happy", "Sad", "Anxious", "Stressed", "Angry", "Lonely", "Grateful", "Overwhelmed", "Hopeful", "Calm"]
+LANGUAGES = ["English", "Spanish", "French", "German", "Turkish"]
+
+DEFAULT_MIX = "generate=5,save=2,list=3"
+
+class Operations:
+    """
+    One request per operation name, with randomized emotion and language.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, page_size: int):
+        self.client = client
+        self.rng = rng
+        self.page_size = page_size
+        self.etag: Optional[str] = None
+
+    def _pair(self) -> dict:
+        return {"emotion": self.rng.choice(EMOTIONS), "language": self.rng.choice(LANGUAGES)}
+
+    async def generate(self) -> httpx.Response:
+        return await self.client.post("/api/generate-message", json=self._pair())
+
+    async def generate_batch(self) -> httpx.Response:
+        items = [self._pair() for _ in range(4)]
+        return await self.client.post("/api/generate-messages", json={"items": items})
+
+    async def stream(self) -> httpx.Response:
+        return await self.client.post("/api/generate-message/stream", json=self._pair())
+
+    async def save(self) -> httpx.Response:
+        body = {**self._pair(), "message": f"Benchmark message {self.rng.randrange(10 ** 9)}"}
+        return await self.client.post("/api/save-message", json=body)
+
+    async def list(self) -> httpx.Response:
+        return await self.client.get("/api/saved-messages", params={"limit": self.page_size})
+
+    async def poll(self) -> httpx.Response:
+        # Like a browser revalidating its cached page: send the last ETag seen
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        response = await self.client.get("/api/saved-messages", params={"limit": self.page_size}, headers=headers)
+        self.etag = response.headers.get("etag", self.etag)
+        return response
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Operations, name) or name.startswith("_"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(ordered: list, q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes a task that sleeps for `interval`:
+    the time the loop spent blocked by synchronous work (such as log I/O).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - started - self.interval, 0.0))
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "p50_ms": _ms(percentile(ordered, 50)),
+            "p99_ms": _ms(percentile(ordered, 99)),
+            "max_ms": _ms(ordered[-1] if ordered else None)
+        }
+
+def parse_server_timing(header: Optional[str]) -> dict:
+    """
+    Parse a Server-Timing header into {phase: milliseconds}.
+    """
+    phases = {}
+    for entry in (header or "").split(","):
+        name, _, duration = entry.strip().partition(";dur=")
+        if name and duration:
+            phases[name] = float(duration)
+    return phases
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    """
+    Reduce per-operation (latency, status, server phases) samples to RPS,
+    percentiles and the mean server-side time per phase.
+    """
+    report = {}
+    for name, results in sorted(samples.items()):
+        latencies = sorted(latency for latency, _, _ in results)
+        statuses = {}
+        phase_totals = {}
+        for _, status, phases in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            for phase, duration in phases.items():
+                phase_totals[phase] = phase_totals.get(phase, 0.0) + duration
+        errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+        report[name] = {
+            "requests": len(results),
+            "errors": errors,
+            "error_rate": errors / len(results) if results else 0.0,
+            "rps": len(results) / elapsed,
+            "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "max_ms": _ms(latencies[-1] if latencies else None),
+            "status": statuses,
+            # Mean per request, from the Server-Timing header (llm, db, serialization, ...)
+            "server_timing_ms": {
+                phase: round(total / len(results), 3) for phase, total in sorted(phase_totals.items())
+            }
+        }
+    return report
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+async def drive(operations: Operations, weights: dict, concurrency: int, duration: float) -> tuple[dict, float]:
+    """
+    Run `concurrency` closed-loop workers for `duration` seconds.
+
+    Returns:
+        ({operation: [(latency_s, status, server_phases), ...]}, elapsed seconds)
+    """
+    names = list(weights)
+    cumulative = list(weights.values())
+    samples: dict[str, list] = {name: [] for name in names}
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name = operations.rng.choices(names, cumulative)[0]
+            t = time.perf_counter()
+            phases = {}
+            try:
+                response = await getattr(operations, name)()
+                status = response.status_code
+                phases = parse_server_timing(response.headers.get("server-timing"))
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            samples[name].append((time.perf_counter() - t, status, phases))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float) -> dict:
+    """
+    Wait for the LLM service to load (the database may not answer ping in memory mode).
+    """
+    deadline = time.perf_counter() + timeout
+    body = {}
+    while time.perf_counter() < deadline:
+        response = await client.get("/api/health/ready")
+        body = response.json()
+        if body.get("llm") or "llm" in body.get("errors", {}):
+            break
+        await asyncio.sleep(0.05)
+    return body
+
+async def run_benchmark(client: httpx.AsyncClient, args) -> dict:
+    rng = random.Random(args.seed)
+    operations = Operations(client, rng, args.page_size)
+    weights = parse_mix(args.mix)
+
+    readiness = await wait_until_ready(client, args.ready_timeout)
+
+    # Seed saved messages so list requests return full pages
+    for _ in range(args.seed_messages):
+        await operations.save()
+
+    if args.warmup > 0:
+        await drive(operations, weights, args.concurrency, args.warmup)
+
+    # Event-loop lag is only meaningful when the app shares this loop
+    monitor = LoopLagMonitor() if not args.target else None
+    monitor_task = asyncio.create_task(monitor.run()) if monitor is not None else None
+    samples, elapsed = await drive(operations, weights, args.concurrency, args.duration)
+    if monitor_task is not None:
+        monitor_task.cancel()
+        await asyncio.gather(monitor_task, return_exceptions=True)
+    endpoints = summarize(samples, elapsed)
+    total = summarize({"all": [sample for results in samples.values() for sample in results]}, elapsed)["all"]
+    return {
+        "config": {
+            "target": args.target or "in-process",
+            "db": args.db if not args.target else None,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": weights,
+            "page_size": args.page_size,
+            "seed_messages": args.seed_messages,
+            "server_logging": args.log_file or ("stderr" if args.verbose else None),
+            "fake_llm": None if args.target else {
+                "latency_median_s": args.llm_latency,
+                "latency_sigma": args.llm_sigma,
+                "error_rate": args.llm_error_rate,
+                "time_to_first_token_s": args.llm_ttft
+            }
+        },
+        "readiness": readiness,
+        "elapsed_s": elapsed,
+        "total": total,
+        "endpoints": endpoints,
+        "event_loop_lag": monitor.summary() if monitor is not None else None,
+        "fake_llm_calls": None if args.target else fake_llm.config.stats()
+    }
+
+def compare(report: dict, baseline: dict) -> dict:
+    """
+    Ratio of current to baseline RPS and latency percentiles per endpoint.
+    """
+    comparison = {}
+    for name, current in {"all": report["total"], **report["endpoints"]}.items():
+        before = baseline["total"] if name == "all" else baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        comparison[name] = {
+            key: round(current[key] / before[key], 3) if current[key] and before[key] else None
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return comparison
+
+def prepare_in_process(args) -> None:
+    """
+    Swap in the fake LLM and (optionally) the in-memory database, then import the app.
+    """
+    fake_llm.install(fake_llm.FakeLlmConfig(
+        latency_median=args.llm_latency,
+        latency_sigma=args.llm_sigma,
+        error_rate=args.llm_error_rate,
+        time_to_first_token=args.llm_ttft,
+        seed=args.seed
+    ))
+    os.environ.setdefault("EMERGENT_LLM_KEY", "benchmark")
+    # Streams go through the fake litellm, which ignores the endpoint
+    os.environ.setdefault("LLM_API_BASE", "http://fake-llm.invalid")
+    os.environ["DB_NAME"] = args.db_name
+
+    if args.db == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--db memory needs mongomock-motor (pip install mongomock-motor)")
+        import motor.motor_asyncio
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+        os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    if args.log_file:
+        os.environ["LOG_FILE"] = args.log_file
+    elif not args.verbose:
+        logging.disable(logging.INFO)
+
+async def run_in_process(args) -> dict:
+    import server
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            return await run_benchmark(client, args)
+
+async def run_over_http(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.target, limits=limits, timeout=args.timeout) as client:
+        return await run_benchmark(client, args)
+
+def serve(args) -> None:
+    import uvicorn
+    import server
+
+    uvicorn.run(server.app, host="127.0.0.1", port=args.serve, log_level="warning")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="base URL of a running server; default runs the app in-process")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only serve the app with the fakes on PORT")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds of load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent closed-loop clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. generate=5,save=2,list=3 "
+                        "(also: generate_batch, stream)")
+    parser.add_argument("--page-size", type=int, default=50, help="limit for list requests")
+    parser.add_argument("--seed-messages", type=int, default=100, help="messages saved before the run")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the load mix and fake LLM")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request")
+    parser.add_argument("--ready-timeout", type=float, default=30.0, help="seconds to wait for the LLM service")
+    parser.add_argument("--db", choices=("memory", "mongo"), default="memory",
+                        help="in-process database: mongomock-motor, or MongoDB at MONGO_URL")
+    parser.add_argument("--db-name", default="moodmate_benchmark", help="database name for in-process runs")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake LLM median latency in seconds")
+    parser.add_argument("--llm-sigma", type=float, default=0.3, help="fake LLM log-normal latency spread")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of fake LLM calls that fail")
+    parser.add_argument("--llm-ttft", type=float, default=0.15, help="fake LLM time to first streamed token")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's info logging")
+    parser.add_argument("--log-file", help="keep the server's info logging and write it to this file "
+                        "(compare LOG_ASYNC=true/false for the event-loop lag)")
+    args = parser.parse_args()
+
+    if args.target is None:
+        prepare_in_process(args)
+    if args.serve:
+        serve(args)
+        return
+
+    report = asyncio.run(run_over_http(args) if args.target else run_in_process(args))
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        report["comparison"] = {"baseline": args.compare, "ratios": compare(report, baseline)}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Event-loop cost of request logging, per logging mode.
+
+Runs --tasks coroutines that each log one info record (with structured
+fields) every --interval seconds, the way request handlers do, while
+measuring the event-loop lag (how late a 5 ms sleep wakes up). The output is
+a stream whose writes take --write-delay seconds, standing in for a slow
+terminal, pipe or log collector. Reports, as JSON, the time a log call takes
+on the calling thread and the loop lag for each mode:
+
+    sync      handler formats and writes on the event loop (LOG_ASYNC=false)
+    queued    records queued for the listener thread (default)
+    sampled   queued, keeping --sample-rate of info records (LOG_INFO_SAMPLE_RATE)
+
+Usage (from backend/):
+    python -m benchmarks.log_overhead --duration 3 --write-delay 0.0005
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import time
+
+from benchmarks.load import LoopLagMonitor, percentile
+from log_config import LogPipeline
+
+class SlowStream(io.StringIO):
+    """
+    Text stream whose every write blocks for `delay` seconds.
+    """
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        self.writes += 1
+        # Keep memory flat; only the cost of the write matters
+        self.seek(0)
+        self.truncate()
+        return len(text)
+
+async def log_load(logger: logging.Logger, tasks: int, interval: float, duration: float) -> list:
+    call_times = []
+    deadline = time.perf_counter() + duration
+
+    async def handler(n: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            started = time.perf_counter()
+            logger.info(
+                "Generated message for emotion=%s, language=%s", "Happy", "English",
+                extra={"emotion": "Happy", "language": "English", "prompt_version": "v1", "request": f"{n}-{i}"}
+            )
+            call_times.append(time.perf_counter() - started)
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(*(handler(n) for n in range(tasks)))
+    return call_times
+
+async def run_mode(args, asynchronous: bool, sample_rate: float) -> dict:
+    stream = SlowStream(args.write_delay)
+    pipeline = LogPipeline(sample_rate=sample_rate, asynchronous=asynchronous, stream=stream, queue_size=args.queue_size)
+    pipeline.start()
+    monitor = LoopLagMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    try:
+        call_times = await log_load(logging.getLogger("benchmark"), args.tasks, args.interval, args.duration)
+    finally:
+        monitor_task.cancel()
+        await asyncio.gather(monitor_task, return_exceptions=True)
+        stats = pipeline.stats()
+        pipeline.stop()
+
+    ordered = sorted(call_times)
+    return {
+        "log_calls": len(call_times),
+        "written": stream.writes,
+        "dropped_sampled": stats["dropped_sampled"],
+        "dropped_full": stats["dropped_full"],
+        "call_us_mean": round(sum(call_times) / len(call_times) * 1e6, 2) if call_times else None,
+        "call_us_p99": round(percentile(ordered, 99) * 1e6, 2) if ordered else None,
+        "event_loop_lag": monitor.summary()
+    }
+
+async def run(args) -> dict:
+    report = {
+        "config": {
+            "duration_s": args.duration,
+            "tasks": args.tasks,
+            "interval_s": args.interval,
+            "write_delay_s": args.write_delay,
+            "sample_rate": args.sample_rate
+        }
+    }
+    for name, asynchronous, sample_rate in (
+        ("sync", False, 1.0),
+        ("queued", True, 1.0),
+        ("sampled", True, args.sample_rate)
+    ):
+        report[name] = await run_mode(args, asynchronous, sample_rate)
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per mode")
+    parser.add_argument("--tasks", type=int, default=50, help="concurrent logging coroutines")
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between one task's log calls")
+    parser.add_argument("--write-delay", type=float, default=0.0005, help="seconds each output write blocks")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="info sample rate for the sampled mode")
+    parser.add_argument("--queue-size", type=int, default=10000, help="record queue size for the queued modes")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Prompt size and rendering cost per prompt template.
+
+For every template in prompts.TEMPLATES, reports the mean input tokens per
+single-message call and per batch item (over all supported emotion/language
+pairs), and the time to render a prompt from the precompiled template, as JSON.
+Tokens are counted with tiktoken when it is installed, otherwise estimated.
+
+Usage (from backend/):
+    python -m benchmarks.prompts --batch-size 10 --iterations 20000
+"""
+import argparse
+import json
+import time
+
+from message_service import FALLBACK_MESSAGES, SUPPORTED_EMOTIONS
+from prompts import TEMPLATES, count_tokens, tokenizer_name
+
+def batch_tokens_per_item(template, pairs: list, batch_size: int) -> float:
+    batches = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+    total = sum(sum(count_tokens(text) for text in template.render_batch(batch)) for batch in batches)
+    return total / len(pairs)
+
+def render_us(template, pairs: list, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        template.render(*pairs[i % len(pairs)])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    pairs = [(emotion, language) for emotion in SUPPORTED_EMOTIONS for language in FALLBACK_MESSAGES]
+    report = {}
+    for version, template in TEMPLATES.items():
+        report[version] = {
+            "tokens_per_message": round(template.prompt_tokens(pairs), 1),
+            "batch_tokens_per_item": round(batch_tokens_per_item(template, pairs, args.batch_size), 1),
+            "render_us": round(render_us(template, pairs, args.iterations), 3)
+        }
+    report["tokenizer"] = tokenizer_name()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Latency-aware routing across LLM backends, against local fake providers.
+
+Each backend in --backends is faked with its own latency and error rate
+("provider/model=median_seconds:error_rate"). The benchmark drives
+generate_message() from --concurrency workers in three phases of --duration
+seconds each and reports, as JSON, the latency percentiles, fallback rate,
+failovers and the share of calls each backend answered:
+
+    single    only the first backend (LLM_BACKENDS with one entry)
+    routed    all backends, fastest healthy one first
+    outage    routed, with the fastest backend failing every call
+
+Usage (from backend/):
+    python -m benchmarks.routing --duration 3 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from benchmarks import fake_llm
+from benchmarks.load import percentile
+
+LANGUAGES = ("English", "Spanish", "French", "German")
+EMOTIONS = ("Happy", "Sad", "Anxious", "Angry", "Tired", "Excited")
+
+def parse_fakes(value: str) -> dict[str, fake_llm.FakeLlmConfig]:
+    fakes = {}
+    for entry in value.split(","):
+        name, _, spec = entry.strip().partition("=")
+        median, _, error_rate = spec.partition(":")
+        fakes[name] = fake_llm.FakeLlmConfig(latency_median=float(median), error_rate=float(error_rate or 0))
+    return fakes
+
+async def drive(service, concurrency: int, duration: float) -> tuple[list, int]:
+    from message_service import fallback_message
+
+    latencies = []
+    fallbacks = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal fallbacks
+        while time.perf_counter() < deadline:
+            emotion, language = random.choice(EMOTIONS), random.choice(LANGUAGES)
+            started = time.perf_counter()
+            text, _ = await service.generate_message(emotion, language)
+            latencies.append(time.perf_counter() - started)
+            fallbacks += text == fallback_message(language)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, fallbacks
+
+async def run_phase(args, backend_names: list[str]) -> dict:
+    from message_service import MessageGenerationService
+
+    os.environ["LLM_BACKENDS"] = ",".join(backend_names)
+    service = MessageGenerationService()
+    latencies, fallbacks = await drive(service, args.concurrency, args.duration)
+
+    backends = service.router.stats()
+    successes = sum(backend["successes"] for backend in backends.values()) or 1
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "fallback_rate": round(fallbacks / len(latencies), 4) if latencies else None,
+        "latency_p50": round(percentile(ordered, 50), 4) if ordered else None,
+        "latency_p95": round(percentile(ordered, 95), 4) if ordered else None,
+        "backends": {
+            name: {
+                "share": round(backend["successes"] / successes, 4),
+                "attempts": backend["attempts"],
+                "errors": backend["errors"],
+                "latency_estimate": round(backend["latency_seconds"], 4) if backend["latency_seconds"] else None,
+                "breaker": backend["breaker"]["state"]
+            }
+            for name, backend in backends.items()
+        }
+    }
+
+async def run(args) -> dict:
+    fakes = parse_fakes(args.backends)
+    fake_llm.install(fake_llm.FakeLlmConfig(latency_median=args.llm_latency), fakes)
+    os.environ.setdefault("EMERGENT_LLM_KEY", "benchmark")
+    os.environ["LLM_LANGUAGE_BACKENDS"] = args.language_backends
+
+    names = list(fakes)
+    fastest = min(names, key=lambda name: fakes[name].latency_median)
+    report = {
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "backends": args.backends,
+            "language_backends": args.language_backends
+        },
+        "single": await run_phase(args, names[:1]),
+        "routed": await run_phase(args, names)
+    }
+    fakes[fastest].error_rate = 1.0
+    report["outage"] = {"failing": fastest, **await run_phase(args, names)}
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per phase")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent callers")
+    parser.add_argument(
+        "--backends",
+        default="openai/gpt-4o-mini=0.6:0.02,gemini/gemini-2.0-flash=0.25:0.02,anthropic/claude-3-5-haiku-20241022=0.4:0.02",
+        help="fake backends as provider/model=median_seconds:error_rate, comma-separated"
+    )
+    parser.add_argument("--language-backends", default="", help="LLM_LANGUAGE_BACKENDS for the routed phases")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="median latency of unlisted backends")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Serialization cost per page of GET /api/saved-messages.
+
+Compares, for one page of projected Mongo documents, FastAPI's default path
+(SavedMessage per row, response model, jsonable_encoder, json.dumps) with the
+fast path the endpoint uses (orjson over the raw documents), and reports the
+time per page as JSON.
+
+Usage (from backend/):
+    python -m benchmarks.serialization --page-size 50 --iterations 2000
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from models import SavedMessage, SavedMessagesResponse
+
+def sample_page(page_size: int) -> list:
+    now = datetime.utcnow().replace(microsecond=0)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "emotion": "Grateful",
+            "language": "Türkçe",
+            "text": "Bugün kendine nazik davran; küçük adımlar da seni ileri taşır 🌱",
+            "timestamp": now - timedelta(milliseconds=i * 37),
+            "prompt_version": "v1"
+        }
+        for i in range(page_size)
+    ]
+
+def model_path(page: list, next_cursor: str) -> bytes:
+    response = SavedMessagesResponse(messages=[SavedMessage(**doc) for doc in page], next_cursor=next_cursor)
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def fast_path(page: list, next_cursor: str) -> bytes:
+    return orjson.dumps({"messages": page, "next_cursor": next_cursor})
+
+def time_per_page(fn, page: list, iterations: int) -> float:
+    next_cursor = "cursor"
+    fn(page, next_cursor)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(page, next_cursor)
+    return (time.perf_counter() - started) / iterations
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    page = sample_page(args.page_size)
+    if model_path(page, "cursor") != fast_path(page, "cursor"):
+        raise SystemExit("Fast path output differs from the response model output")
+
+    model_s = time_per_page(model_path, page, args.iterations)
+    fast_s = time_per_page(fast_path, page, args.iterations)
+    print(json.dumps({
+        "page_size": args.page_size,
+        "iterations": args.iterations,
+        "model_path_us_per_page": round(model_s * 1e6, 2),
+        "fast_path_us_per_page": round(fast_s * 1e6, 2),
+        "speedup": round(model_s / fast_s, 2)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
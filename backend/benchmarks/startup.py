@@ -0,0 +1,100 @@
+"""
+Startup-time benchmark for the MoodMate backend.
+
+Measures, in a fresh interpreter per run, how long `import server` takes, how
+long the app takes to start, and the latency of the first health and first
+generate-message requests. Pass --baseline <git-rev> to run the same
+measurements against an older revision of backend/ for a before/after view.
+
+Usage (from backend/):
+    python -m benchmarks.startup --runs 5 --baseline HEAD~1
+
+Requires the same environment as the server (MONGO_URL, DB_NAME, EMERGENT_LLM_KEY).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Runs inside the child interpreter with backend/ as the working directory
+CHILD_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import server
+t_import = time.perf_counter()
+
+from fastapi.testclient import TestClient
+result = {"import_s": t_import - t0}
+with TestClient(server.app) as client:
+    t_started = time.perf_counter()
+    result["startup_s"] = t_started - t_import
+
+    t = time.perf_counter()
+    client.get("/api/")
+    result["first_health_request_s"] = time.perf_counter() - t
+
+    # Wait until the service reports it can generate (older revisions have no probe)
+    deadline = time.perf_counter() + float(sys.argv[1])
+    while time.perf_counter() < deadline:
+        status = client.get("/api/health/ready").status_code
+        if status != 503:
+            break
+        time.sleep(0.01)
+    result["ready_s"] = time.perf_counter() - t_import
+
+    t = time.perf_counter()
+    client.post("/api/generate-message", json={"emotion": "Happy", "language": "English"})
+    result["first_generate_request_s"] = time.perf_counter() - t
+print(json.dumps(result))
+"""
+
+def measure(backend_dir: Path, runs: int, ready_timeout: float) -> dict:
+    samples = []
+    for _ in range(runs):
+        child = subprocess.run(
+            [sys.executable, "-c", CHILD_SCRIPT, str(ready_timeout)],
+            cwd=backend_dir,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True
+        )
+        if child.returncode != 0:
+            raise RuntimeError(f"Benchmark run in {backend_dir} failed:\n{child.stderr}")
+        samples.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+def export_revision(rev: str, target: Path) -> Path:
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", rev, "backend"],
+        cwd=BACKEND_DIR.parent,
+        capture_output=True,
+        check=True
+    ).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(target)
+    return target / "backend"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--baseline", help="git revision to compare against, e.g. HEAD~1")
+    parser.add_argument("--ready-timeout", type=float, default=30.0, help="seconds to wait for readiness")
+    args = parser.parse_args()
+
+    report = {"runs": args.runs, "current": measure(BACKEND_DIR, args.runs, args.ready_timeout)}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline_dir = export_revision(args.baseline, Path(tmp))
+            report["baseline"] = {"rev": args.baseline, **measure(baseline_dir, args.runs, args.ready_timeout)}
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
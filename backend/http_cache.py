@@ -0,0 +1,80 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+def etag(version: int, *parts) -> str:
+    """
+    Build a weak ETag for the response identified by parts (route, query
+    parameters) at one version of the underlying data.
+    """
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=8).hexdigest()
+    return f'W/"{version:x}-{digest}"'
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against tag, as for GET requests.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag[2:] if tag.startswith("W/") else tag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+class PageCache:
+    """
+    Serialized response bodies for the current version of a data set.
+
+    Entries are keyed by query and belong to one version; the first lookup or
+    store with a newer version drops them all, so a body is served until the
+    next write and never after it. Bodies computed for an older version are
+    not stored. At most max_entries bodies are kept, least recently used first
+    out.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.version: Optional[int] = None
+        self._bodies: OrderedDict[tuple, bytes] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _advance(self, version: int) -> bool:
+        if self.version is None or version > self.version:
+            if self._bodies:
+                self.invalidations += 1
+            self._bodies.clear()
+            self.version = version
+        return version == self.version
+
+    def get(self, key: tuple, version: int) -> Optional[bytes]:
+        body = self._bodies.get(key) if self._advance(version) else None
+        if body is None:
+            self.misses += 1
+            return None
+        self._bodies.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: tuple, version: int, body: bytes) -> None:
+        if not self._advance(version):
+            return
+        self._bodies[key] = body
+        self._bodies.move_to_end(key)
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "entries": len(self._bodies),
+            "bytes": sum(len(body) for body in self._bodies.values())
+        }
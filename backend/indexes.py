@@ -0,0 +1,128 @@
+import logging
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Indexes the endpoints rely on, per collection. Names are left to Mongo's
+# default (e.g. "id_1") so re-declaring an index never conflicts with one that
+# already exists under the same key pattern.
+INDEXES = {
+    "saved_messages": [
+        # Newest-first listing and keyset pagination; also serves plain timestamp sorts
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+        # Lookups by the app-level UUID
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Listing filtered by emotion and language; each single filter needs its
+        # own index for the timestamp sort to come from the index
+        IndexModel([("emotion", ASCENDING), ("language", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("emotion", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("language", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "saved_messages_compact": [
+        # Newest-first listing and keyset pagination in the compact layout
+        IndexModel([("t", DESCENDING), ("_id", DESCENDING)]),
+        # Listing filtered by emotion and/or language code, as above
+        IndexModel([("e", ASCENDING), ("l", ASCENDING), ("t", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("e", ASCENDING), ("t", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("l", ASCENDING), ("t", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "message_corpus": [
+        # Random sampling and counts per pair; uniqueness keeps duplicate texts out
+        IndexModel(
+            [("prompt_version", ASCENDING), ("emotion", ASCENDING), ("language", ASCENDING), ("fingerprint", ASCENDING)],
+            unique=True
+        ),
+    ],
+    "shared_state": [
+        # Let Mongo drop expired rate-limit windows and leases
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "shared_queue": [
+        # Oldest-first pops and depth counts per pool queue
+        IndexModel([("key", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    "message_cache": [
+        # Shared response cache lookups and trimming per key
+        IndexModel([("key", ASCENDING), ("created_at", DESCENDING)]),
+        # Let Mongo drop expired cache entries
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ]
+}
+
+# Indexes each route needs, as (collection, index name), per storage layout
+ROUTE_INDEXES = {
+    "legacy": {
+        "save-message": [
+            ("saved_messages", "id_1"),
+        ],
+        "saved-messages": [
+            ("saved_messages", "timestamp_-1_id_-1"),
+            ("saved_messages", "emotion_1_language_1_timestamp_-1_id_-1"),
+            ("saved_messages", "emotion_1_timestamp_-1_id_-1"),
+            ("saved_messages", "language_1_timestamp_-1_id_-1"),
+        ],
+    },
+    "compact": {
+        # Uniqueness comes from _id, which Mongo always indexes
+        "save-message": [],
+        "saved-messages": [
+            ("saved_messages_compact", "t_-1__id_-1"),
+            ("saved_messages_compact", "e_1_l_1_t_-1__id_-1"),
+            ("saved_messages_compact", "e_1_t_-1__id_-1"),
+            ("saved_messages_compact", "l_1_t_-1__id_-1"),
+        ],
+    },
+}
+
+class IndexManager:
+    """
+    Declares and idempotently creates the Mongo indexes the API needs.
+
+    In strict mode, routes whose required indexes could not be built answer 503
+    instead of falling back to collection scans.
+    """
+
+    def __init__(self, db, strict: bool = False, layout: str = "legacy"):
+        self.db = db
+        self.strict = strict
+        self.route_indexes = ROUTE_INDEXES[layout]
+        self.ready: set[tuple[str, str]] = set()
+
+    async def ensure_indexes(self) -> None:
+        """
+        Create every declared index, then record which ones actually exist.
+        """
+        for collection_name, models in INDEXES.items():
+            collection = self.db[collection_name]
+            for model in models:
+                name = model.document["name"]
+                try:
+                    await collection.create_indexes([model])
+                    logger.info("Index %s.%s is ready", collection_name, name)
+                except Exception as e:
+                    logger.error("Failed to build index %s.%s: %s", collection_name, name, e)
+
+            try:
+                existing = await collection.index_information()
+            except Exception as e:
+                logger.error("Failed to list indexes on %s: %s", collection_name, e)
+                continue
+            self.ready.update((collection_name, name) for name in existing)
+
+    def missing(self, route: str) -> list[tuple[str, str]]:
+        """
+        Return the indexes required by a route that are not built.
+        """
+        return [index for index in self.route_indexes.get(route, []) if index not in self.ready]
+
+    def check(self, route: str) -> None:
+        """
+        Reject the route with 503 in strict mode when its indexes are missing.
+        """
+        if not self.strict:
+            return
+        missing = self.missing(route)
+        if missing:
+            names = ", ".join(f"{collection}.{name}" for collection, name in missing)
+            raise HTTPException(status_code=503, detail=f"Required indexes are missing: {names}")
\ No newline at end of file
@@ -0,0 +1,187 @@
+import logging
+from typing import AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class LlmClient:
+    """
+    Long-lived LLM client shared by every request.
+
+    Owns one keep-alive HTTP connection pool for the lifetime of the app, so
+    requests reuse warm TLS connections instead of opening new ones. Each send
+    is stateless: no chat history is carried over between calls.
+
+    The provider SDK stack (emergentintegrations and litellm) is imported on
+    first use rather than at module import, so importing this module is cheap.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        provider: str = "openai",
+        model: str = "gpt-4o-mini",
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0,
+        api_base: Optional[str] = None
+    ):
+        self.api_key = api_key
+        # Endpoint for streamed completions (e.g. the proxy behind a universal key)
+        self.api_base = api_base
+        self.provider = provider
+        self.model = model
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """
+        Open the shared connection pool and hand it to the provider SDK layer.
+        """
+        if self._http is not None:
+            return
+        self._http = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        try:
+            # LlmChat talks to providers through litellm; its module-level async
+            # session is picked up by every provider client it builds.
+            import litellm
+            litellm.aclient_session = self._http
+        except ImportError:
+            logger.warning("litellm not available; LLM calls will not share the connection pool")
+        logger.info("LLM client started")
+
+    async def close(self) -> None:
+        """
+        Close the shared connection pool.
+        """
+        if self._http is None:
+            return
+        try:
+            import litellm
+            if litellm.aclient_session is self._http:
+                litellm.aclient_session = None
+        except ImportError:
+            pass
+        await self._http.aclose()
+        self._http = None
+        logger.info("LLM client closed")
+
+    async def send(
+        self,
+        system_message: str,
+        text: str,
+        session_id: str = "moodmate",
+        provider: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> str:
+        """
+        Send a single stateless prompt and return the raw response text.
+
+        Args:
+            system_message: System prompt for this call
+            text: User message text
+            session_id: Session label passed to LlmChat
+            provider: Provider override (defaults to the client's provider)
+            model: Model override (defaults to the client's model)
+
+        Returns:
+            Response text from the model
+        """
+        from emergentintegrations.llm.chat import UserMessage
+
+        chat = self._chat(system_message, session_id, provider, model)
+        return await chat.send_message(UserMessage(text=text))
+
+    async def stream(
+        self,
+        system_message: str,
+        text: str,
+        session_id: str = "moodmate",
+        provider: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Send a single stateless prompt and yield the response as it arrives.
+
+        LlmChat only returns whole completions, so token streams go through
+        litellm (the layer under LlmChat) directly, with the same key and
+        connection pool, against api_base. Without an api_base (the key then
+        only works through LlmChat) or without litellm, the whole completion is
+        yielded as a single chunk.
+        """
+        litellm = self._streaming_sdk()
+        if litellm is None:
+            from emergentintegrations.llm.chat import UserMessage
+
+            chat = self._chat(system_message, session_id, provider, model)
+            yield await chat.send_message(UserMessage(text=text))
+            return
+
+        response = await litellm.acompletion(
+            model=f"{provider or self.provider}/{model or self.model}",
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": text}
+            ],
+            api_key=self.api_key,
+            api_base=self.api_base,
+            stream=True
+        )
+        try:
+            async for chunk in response:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    yield content
+        finally:
+            # Release the upstream connection when the caller stops early
+            aclose = getattr(response, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    @property
+    def streams_tokens(self) -> bool:
+        """
+        Whether stream() delivers tokens as they are generated.
+        """
+        return self._streaming_sdk() is not None
+
+    def _streaming_sdk(self):
+        if not self.api_base:
+            return None
+        try:
+            import litellm
+        except ImportError:
+            return None
+        return litellm
+
+    def _chat(
+        self,
+        system_message: str,
+        session_id: str,
+        provider: Optional[str],
+        model: Optional[str]
+    ):
+        from emergentintegrations.llm.chat import LlmChat
+
+        # LlmChat only holds the prompt and per-session history; building one is
+        # cheap, and a fresh instance keeps every send free of earlier turns.
+        # Connection state lives in the shared pool opened by start().
+        return LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(provider or self.provider, model or self.model)
+
+def is_config_error(error: Exception) -> bool:
+    """
+    Whether an upstream error is a rejected request (bad key, endpoint or
+    model) rather than a sign that the provider is unhealthy.
+    """
+    return getattr(error, "status_code", None) in (400, 401, 403, 404)
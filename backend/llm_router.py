@@ -0,0 +1,142 @@
+import random
+from typing import Optional
+
+from resilience import CircuitBreaker
+
+class LlmBackend:
+    """
+    One provider/model the service can send prompts to, with its own circuit
+    breaker and moving averages (EWMA) of its latency and error rate.
+    """
+
+    def __init__(self, provider: str, model: str, alpha: float = 0.2, breaker: Optional[CircuitBreaker] = None):
+        self.provider = provider
+        self.model = model
+        self.name = f"{provider}/{model}"
+        self.alpha = alpha
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+        # None until the first completed call
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+
+        self.attempts = 0
+        self.successes = 0
+        self.errors = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def record(self, success: bool, seconds: Optional[float] = None) -> None:
+        """
+        Fold one call outcome into the estimates. Pass seconds for successes and
+        timeouts; a fast failure says nothing about how fast the backend answers.
+        """
+        self.error_rate += self.alpha * ((0.0 if success else 1.0) - self.error_rate)
+        if seconds is not None:
+            self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+        if success:
+            self.successes += 1
+        else:
+            self.errors += 1
+
+    def score(self, prior_latency: float = 1.0) -> float:
+        """
+        Expected seconds until a successful answer: the latency estimate scaled
+        by the expected number of attempts. A backend without a latency sample
+        yet (new, or only failing fast) is scored at prior_latency, so its
+        error rate still pushes it down the order.
+        """
+        latency = prior_latency if self.latency is None else self.latency
+        return latency / max(1.0 - self.error_rate, 0.05)
+
+    def stats(self) -> dict:
+        return {
+            "latency_seconds": self.latency,
+            "error_rate": self.error_rate,
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "errors": self.errors,
+            "breaker": self.breaker.stats()
+        }
+
+class LlmRouter:
+    """
+    Orders the configured backends for each request.
+
+    A language with an override tries its listed backends first, in order.
+    The other backends follow, fastest healthy one first by score(), with
+    backends not measured yet scored like the fastest measured one and tried
+    before it on a tie. Backends whose breaker is open come last and are
+    skipped by the caller unless the breaker lets a probe through. With
+    probability `explore` a random healthy backend is moved to the front, so
+    the estimates of slower backends stay current.
+    """
+
+    def __init__(self, backends: list[LlmBackend], overrides: Optional[dict[str, list[str]]] = None, explore: float = 0.05):
+        if not backends:
+            raise ValueError("LlmRouter needs at least one backend")
+        self.backends = backends
+        by_name = {backend.name: backend for backend in backends}
+        self.overrides: dict[str, list[LlmBackend]] = {}
+        for language, names in (overrides or {}).items():
+            unknown = [name for name in names if name not in by_name]
+            if unknown:
+                raise ValueError(f"Unknown LLM backends for {language}: {', '.join(unknown)}")
+            self.overrides[language] = [by_name[name] for name in names]
+        self.explore = explore
+
+    def route(self, language: Optional[str] = None) -> tuple[list[LlmBackend], str]:
+        """
+        Return the backends to try for one request, in order, and the reason
+        the first one was chosen: "override", "fastest", "explore" or "only".
+        """
+        preferred = self.overrides.get(language, [])
+        measured = [backend.latency for backend in self.backends if backend.latency is not None]
+        prior = min(measured) if measured else 1.0
+        rest = sorted(
+            (backend for backend in self.backends if backend not in preferred),
+            key=lambda backend: (not backend.healthy, backend.score(prior), backend.latency is not None)
+        )
+        if len(self.backends) == 1:
+            return self.backends, "only"
+        if preferred and preferred[0].healthy:
+            return preferred + rest, "override"
+
+        ordered = [backend for backend in preferred if backend.healthy] + rest
+        ordered += [backend for backend in preferred if not backend.healthy]
+        healthy = [backend for backend in ordered if backend.healthy]
+        if len(healthy) > 1 and random.random() < self.explore:
+            chosen = random.choice(healthy[1:])
+            ordered.remove(chosen)
+            return [chosen] + ordered, "explore"
+        return ordered, "override" if preferred and ordered[0] in preferred else "fastest"
+
+    def stats(self) -> dict:
+        return {backend.name: backend.stats() for backend in self.backends}
+
+def parse_backends(value: str) -> list[tuple[str, str]]:
+    """
+    Parse "provider/model,provider/model" into (provider, model) pairs.
+    """
+    backends = []
+    for entry in value.split(","):
+        provider, _, model = entry.strip().partition("/")
+        if not provider or not model:
+            raise ValueError(f"LLM backend must look like provider/model: {entry.strip()}")
+        backends.append((provider, model))
+    return backends
+
+def parse_overrides(value: str) -> dict[str, list[str]]:
+    """
+    Parse "Language:provider/model|provider/model,Language:provider/model"
+    into {language: [backend names]}.
+    """
+    overrides = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        language, _, names = entry.partition(":")
+        if not language or not names:
+            raise ValueError(f"LLM language override must look like Language:provider/model: {entry}")
+        overrides[language.strip()] = [name.strip() for name in names.split("|")]
+    return overrides
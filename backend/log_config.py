@@ -0,0 +1,194 @@
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Optional, TextIO
+
+import orjson
+
+# Format of the plain-text output (LOG_FORMAT=text)
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Loggers that keep their own handlers and do not propagate (uvicorn writes
+# its access log on the event loop this way); the pipeline takes them over
+ROUTED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger and message, plus every
+    field passed with `extra=` and the formatted traceback, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep every WARNING and above, and a `rate` fraction of lower-level
+    records. Kept sampled records carry sample_rate so counts can be scaled back.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        self.dropped += 1
+        return False
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records unformatted for the listener thread, and drop them rather
+    than block when the queue is full.
+
+    The stdlib QueueHandler merges the message arguments and formats the
+    traceback before queueing, on the calling thread; records here stay in the
+    process, so all formatting is left to the listener.
+    """
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogPipeline:
+    """
+    Root logging for the server: records are filtered by level and sampling on
+    the calling thread, then queued, and formatted and written by a listener
+    thread so that log I/O never runs on the event loop. Output goes to the
+    file at `path`, else to `stream` (stderr by default).
+
+    With asynchronous=False the output handler is attached directly instead,
+    which writes on the calling thread (useful for debugging and comparison).
+
+    The loggers in ROUTED_LOGGERS lose their own handlers and propagate to the
+    root logger while the pipeline runs, so uvicorn's access and error logs go
+    through it too.
+
+    Raises:
+        ValueError: If level is not a logging level name or number
+    """
+
+    def __init__(
+        self,
+        level: str = "INFO",
+        json_format: bool = True,
+        sample_rate: float = 1.0,
+        queue_size: int = 10000,
+        path: Optional[str] = None,
+        asynchronous: bool = True,
+        stream: Optional[TextIO] = None
+    ):
+        self.level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        if not isinstance(self.level, int):
+            raise ValueError(f"Unknown log level: {level}")
+        self.json_format = json_format
+        self.sample_rate = sample_rate
+        self.queue_size = queue_size
+        self.path = path
+        self.asynchronous = asynchronous
+        self.stream = stream
+
+        self.sampler = SamplingFilter(sample_rate)
+        self._handler: Optional[logging.Handler] = None
+        self._front: Optional[logging.Handler] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._previous: Optional[tuple[list, int]] = None
+        self._routed: dict[str, tuple[list, bool]] = {}
+
+    def _output(self) -> logging.Handler:
+        if self.path:
+            handler = logging.FileHandler(self.path, encoding="utf-8")
+        else:
+            handler = logging.StreamHandler(self.stream or sys.stderr)
+        handler.setFormatter(JsonFormatter() if self.json_format else logging.Formatter(TEXT_FORMAT))
+        return handler
+
+    def start(self) -> None:
+        """
+        Replace the root logger's handlers with this pipeline.
+        """
+        if self._front is not None:
+            return
+        root = logging.getLogger()
+        self._previous = (root.handlers[:], root.level)
+
+        self._handler = self._output()
+        if self.asynchronous:
+            self._front = RecordQueueHandler(queue.Queue(maxsize=self.queue_size))
+            self._listener = logging.handlers.QueueListener(self._front.queue, self._handler)
+            self._listener.start()
+        else:
+            self._front = self._handler
+        self._front.addFilter(self.sampler)
+
+        root.handlers = [self._front]
+        root.setLevel(self.level)
+
+        for name in ROUTED_LOGGERS:
+            routed = logging.getLogger(name)
+            self._routed[name] = (routed.handlers[:], routed.propagate)
+            routed.handlers = []
+            routed.propagate = True
+
+    def stop(self) -> None:
+        """
+        Write out every queued record, then restore the previous root handlers
+        and the handlers of the routed loggers.
+        """
+        if self._front is None:
+            return
+        for name, (handlers, propagate) in self._routed.items():
+            routed = logging.getLogger(name)
+            routed.handlers = handlers
+            routed.propagate = propagate
+        self._routed.clear()
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self._handler.close()
+        root = logging.getLogger()
+        root.handlers, level = self._previous
+        root.setLevel(level)
+        self._front = None
+
+    def stats(self) -> dict:
+        """
+        Return the queue depth and the records dropped by sampling and by a full queue.
+        """
+        front = self._front
+        return {
+            "queue_depth": front.queue.qsize() if isinstance(front, RecordQueueHandler) else 0,
+            "dropped_full": front.dropped if isinstance(front, RecordQueueHandler) else 0,
+            "dropped_sampled": self.sampler.dropped
+        }
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import re
+from datetime import datetime
+from typing import Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    """
+    Reduce a message to its wording: lowercase, no punctuation or emoji, single spaces.
+    """
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+def fingerprint(text: str) -> str:
+    """
+    Hash of the normalized text; messages differing only in case, punctuation,
+    emoji or spacing share a fingerprint.
+    """
+    return hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=12).hexdigest()
+
+def trigrams(text: str) -> set:
+    # Character trigrams work for languages written without spaces too
+    normalized = normalize(text)
+    return {normalized[i:i + 3] for i in range(max(len(normalized) - 2, 1))}
+
+def is_near_duplicate(candidate: set, existing: list, threshold: float) -> bool:
+    """
+    Return True if the candidate's trigram set has Jaccard similarity of at
+    least threshold with any of the existing trigram sets.
+    """
+    for other in existing:
+        union = len(candidate | other)
+        if union and len(candidate & other) / union >= threshold:
+            return True
+    return False
+
+class MessageCorpus:
+    """
+    Pre-generated messages per (emotion, language) and prompt version, stored in
+    the `message_corpus` collection and served with a random-sample query.
+
+    Filled offline by prewarm.py. A unique index on the text fingerprint keeps
+    exact and trivially different duplicates out.
+    """
+
+    def __init__(self, collection, prompt_version: str):
+        self.collection = collection
+        self.prompt_version = prompt_version
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def sample(self, emotion: str, language: str) -> Optional[str]:
+        """
+        Return a random corpus message for the pair, or None if the pair has none.
+        """
+        texts = await self.sample_many(emotion, language, 1)
+        return texts[0] if texts else None
+
+    async def sample_many(self, emotion: str, language: str, size: int) -> list[str]:
+        """
+        Return up to `size` distinct random corpus messages for the pair.
+        """
+        try:
+            documents = await self.collection.aggregate([
+                {"$match": {"prompt_version": self.prompt_version, "emotion": emotion, "language": language}},
+                {"$sample": {"size": size}},
+                {"$project": {"_id": 0, "text": 1}}
+            ]).to_list(length=size)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Corpus lookup failed: %s", e)
+            return []
+
+        self.hits += len(documents)
+        self.misses += size - len(documents)
+        return [document["text"] for document in documents]
+
+    async def counts(self) -> dict[tuple[str, str], int]:
+        """
+        Return the number of stored messages per (emotion, language) pair.
+        """
+        groups = await self.collection.aggregate([
+            {"$match": {"prompt_version": self.prompt_version}},
+            {"$group": {"_id": {"emotion": "$emotion", "language": "$language"}, "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        return {(group["_id"]["emotion"], group["_id"]["language"]): group["count"] for group in groups}
+
+    async def texts(self, emotion: str, language: str) -> list[str]:
+        """
+        Return every stored message for the pair.
+        """
+        documents = await self.collection.find(
+            {"prompt_version": self.prompt_version, "emotion": emotion, "language": language},
+            {"_id": 0, "text": 1}
+        ).to_list(length=None)
+        return [document["text"] for document in documents]
+
+    async def add(self, emotion: str, language: str, texts: list[str]) -> int:
+        """
+        Bulk-insert messages for the pair, skipping ones whose fingerprint is stored.
+
+        Returns:
+            Number of messages inserted
+        """
+        if not texts:
+            return 0
+        now = datetime.utcnow()
+        documents = [
+            {
+                "prompt_version": self.prompt_version,
+                "emotion": emotion,
+                "language": language,
+                "text": text,
+                "fingerprint": fingerprint(text),
+                "created_at": now
+            }
+            for text in texts
+        ]
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+            return len(documents)
+        except BulkWriteError as e:
+            # Duplicate fingerprints are expected; anything else is a real failure
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            return e.details.get("nInserted", 0)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
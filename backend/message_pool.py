@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from typing import Optional
+
+from shared_state import LocalStateBackend, worker_id
+
+logger = logging.getLogger(__name__)
+
+class MessagePool:
+    """
+    Pool of pre-generated messages per (emotion, language) pair.
+
+    Requests are served from the pool without an LLM call; a background task
+    keeps every registered pair between min_depth and max_depth by calling the LLM
+    with bounded concurrency. A served message is removed from the pool, so it
+    is never handed out twice.
+
+    Ready messages live in a shared-state backend: in-process by default, or
+    in Mongo so that every worker serves from and refills the same pool. A
+    pair is only refilled by the worker holding its refill lease, so workers
+    do not duplicate each other's upstream calls.
+    """
+
+    def __init__(
+        self,
+        service,
+        state=None,
+        namespace: str = "",
+        min_depth: int = 2,
+        max_depth: int = 5,
+        concurrency: int = 4,
+        max_keys: int = 256,
+        refill_interval: float = 5.0
+    ):
+        if min_depth < 0 or max_depth < 1 or min_depth > max_depth:
+            raise ValueError("MessagePool requires 0 <= min_depth <= max_depth and max_depth >= 1")
+        self.service = service
+        self.state = state if state is not None else LocalStateBackend()
+        self.namespace = namespace
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.max_keys = max_keys
+        self.refill_interval = refill_interval
+        self.owner = worker_id()
+
+        # Last known depth per pair (refreshed by the refill task) and in-flight refills
+        self._depth: dict[tuple[str, str], int] = {}
+        self._pending: dict[tuple[str, str], int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._fills: set[asyncio.Task] = set()
+        self._backoff_until = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.refill_errors = 0
+
+    def _register(self, key: tuple[str, str]) -> bool:
+        if key not in self._depth:
+            if len(self._depth) >= self.max_keys:
+                return False
+            self._depth[key] = 0
+            self._pending[key] = 0
+        return True
+
+    def _queue(self, key: tuple[str, str]) -> str:
+        emotion, language = key
+        return f"pool:{self.namespace}:{emotion}:{language}"
+
+    def warm(self, pairs) -> None:
+        """
+        Register (emotion, language) pairs so they are filled before the first request.
+        """
+        for emotion, language in pairs:
+            self._register((emotion, language))
+        self._wake()
+
+    async def take(self, emotion: str, language: str) -> Optional[str]:
+        """
+        Pop a ready message for the pair, or return None when the pool is empty.
+
+        Only pairs registered with warm() are pooled; any other pair is a miss,
+        so client-supplied values never trigger upstream refills.
+        """
+        key = (emotion, language)
+        try:
+            message = await self.state.pop(self._queue(key)) if key in self._depth else None
+        except Exception as e:
+            # A shared-state outage must not fail the request; it goes to the LLM instead
+            self.errors += 1
+            self.misses += 1
+            logger.warning("Pool lookup failed for emotion=%s, language=%s: %s", emotion, language, e)
+            return None
+        if message is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if key in self._depth:
+            self._depth[key] = self._depth[key] - 1 if message is not None and self._depth[key] else 0
+            if self._depth[key] < self.min_depth:
+                self._wake()
+        return message
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """
+        Start the background refill task on the running event loop.
+        """
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = 0.0) -> None:
+        """
+        Stop refilling. In-flight LLM calls get up to timeout seconds to finish
+        and land in the pool; any still running after that are cancelled.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        fills = list(self._fills)
+        if fills and timeout > 0:
+            await asyncio.wait(fills, timeout=timeout)
+        for task in fills:
+            task.cancel()
+        await asyncio.gather(*fills, return_exceptions=True)
+        self._fills.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._schedule_refills()
+            except Exception as e:
+                logger.warning("Pool refill scheduling failed: %s", e)
+
+    async def _schedule_refills(self) -> None:
+        # Back off for one interval after a failed refill so an upstream outage
+        # is not hammered on every request that wakes the task
+        if asyncio.get_running_loop().time() < self._backoff_until:
+            return
+        for key in list(self._depth):
+            depth = self._depth[key] = await self.state.length(self._queue(key))
+            if depth + self._pending[key] >= self.min_depth:
+                continue
+            if not await self.state.acquire_lease(self._queue(key), self.owner, self.refill_interval):
+                continue
+            for _ in range(self.max_depth - depth - self._pending[key]):
+                self._pending[key] += 1
+                task = asyncio.create_task(self._fill_one(key))
+                self._fills.add(task)
+                task.add_done_callback(self._fills.discard)
+
+    async def _fill_one(self, key: tuple[str, str]) -> None:
+        emotion, language = key
+        try:
+            async with self._semaphore:
+                message = await self.service.request_message(emotion, language)
+            if message and await self.state.push(self._queue(key), message, self.max_depth):
+                self._depth[key] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.refill_errors += 1
+            self._backoff_until = asyncio.get_running_loop().time() + self.refill_interval
+            logger.warning("Pool refill failed for emotion=%s, language=%s: %s", emotion, language, e)
+        finally:
+            self._pending[key] -= 1
+
+    def stats(self) -> dict:
+        """
+        Return the last known pool depth per pair together with hit/miss/error counters.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "refill_errors": self.refill_errors,
+            "depth": {f"{emotion}/{language}": depth for (emotion, language), depth in self._depth.items()}
+        }
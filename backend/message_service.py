@@ -1,73 +1,514 @@
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 import os
-from datetime import datetime
+import json
+import asyncio
+import time
 import logging
+from typing import AsyncIterator, Optional
+from llm_client import LlmClient, is_config_error
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged
+from admission import AdmissionController, AdmissionRejected
+from llm_router import LlmBackend, LlmRouter, parse_backends, parse_overrides
+from metrics import FALLBACKS, LLM_ATTEMPTS, LLM_FAILOVERS, LLM_ROUTES, PROMPT_LATENCY, PROMPT_OUTCOMES, phase
+from prompts import PromptSelector, PromptTemplate
 
 logger = logging.getLogger(__name__)
 
+# Emotions offered by the frontend
+SUPPORTED_EMOTIONS = (
+    'Happy', 'Sad', 'Anxious', 'Stressed', 'Angry', 'Lonely',
+    'Grateful', 'Overwhelmed', 'Hopeful', 'Calm', 'Neutral'
+)
+
+# Fallback messages used whenever the AI call fails
+FALLBACK_MESSAGES = {
+    'English': 'You are doing great. Keep going! 💙',
+    'Turkish': 'Harika gidiyorsun. Devam et! 💙',
+    'Spanish': '¡Lo estás haciendo genial. Sigue adelante! 💙',
+    'German': 'Du machst das großartig. Mach weiter! 💙',
+    'French': 'Tu fais du bon travail. Continue! 💙',
+    'Italian': 'Stai andando alla grande. Continua così! 💙',
+    'Russian': 'У тебя отлично получается. Продолжай! 💙',
+    'Arabic': 'أنت تقوم بعمل رائع. استمر! 💙',
+    'Japanese': '素晴らしいです。頑張って! 💙'
+}
+
+def fallback_message(language: str) -> str:
+    """
+    Return the static fallback message for a language (English if unknown).
+    """
+    return FALLBACK_MESSAGES.get(language, FALLBACK_MESSAGES['English'])
+
+def metric_labels(emotion: str, language: str) -> tuple[str, str]:
+    """
+    Map an (emotion, language) pair to metric labels, folding values outside
+    the supported sets into "other" to keep label cardinality bounded.
+    """
+    return (
+        emotion if emotion in SUPPORTED_EMOTIONS else "other",
+        language if language in FALLBACK_MESSAGES else "other"
+    )
+
+def parse_message_list(response: str) -> list:
+    """
+    Parse the JSON array returned for a batch prompt, tolerating code fences.
+    """
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[len("json"):]
+    messages = json.loads(text)
+    if not isinstance(messages, list):
+        raise ValueError("Batch response is not a JSON array")
+    return messages
+
 class MessageGenerationService:
-    def __init__(self):
+    def __init__(self, shared_state=None, prompts: PromptSelector = None):
         self.api_key = os.environ.get('EMERGENT_LLM_KEY')
         if not self.api_key:
             raise ValueError("EMERGENT_LLM_KEY not found in environment variables")
-    
-    async def generate_message(self, emotion: str, language: str) -> str:
+        self.client = LlmClient(
+            self.api_key,
+            max_connections=int(os.environ.get('LLM_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.environ.get('LLM_MAX_KEEPALIVE_CONNECTIONS', '20')),
+            api_base=os.environ.get('LLM_API_BASE') or None
+        )
+        self.batch_size = int(os.environ.get('LLM_BATCH_SIZE', '10'))
+
+        # Prompt templates; generate_message/generate_messages pick one per call (A/B test)
+        self.prompts = prompts if prompts is not None else PromptSelector()
+
+        # Latency budget per call; when it runs out the caller gets the fallback
+        self.timeout = float(os.environ.get('LLM_TIMEOUT', '10'))
+        self.batch_timeout = float(os.environ.get('LLM_BATCH_TIMEOUT', '30'))
+        self.stream_timeout = float(os.environ.get('LLM_STREAM_TIMEOUT', '30'))
+
+        # Optional hedging: fire a second request once the first is slower than p95
+        self.hedge = os.environ.get('LLM_HEDGE', 'false').lower() == 'true'
+        self.hedge_delay = float(os.environ.get('LLM_HEDGE_DELAY', '2.0'))
+        self.latency = LatencyTracker()
+
+        # Provider/model backends (LLM_BACKENDS), each with its own circuit breaker.
+        # Every call goes to the fastest healthy backend, or a language's pinned
+        # ones (LLM_LANGUAGE_BACKENDS), and fails over to the next backend on an
+        # error or timeout, up to LLM_MAX_ATTEMPTS attempts within the budget.
+        alpha = float(os.environ.get('LLM_ROUTER_ALPHA', '0.2'))
+        self.router = LlmRouter(
+            [
+                LlmBackend(provider, model, alpha=alpha, breaker=CircuitBreaker(
+                    error_rate=float(os.environ.get('LLM_BREAKER_ERROR_RATE', '0.5')),
+                    min_requests=int(os.environ.get('LLM_BREAKER_MIN_REQUESTS', '10')),
+                    window=int(os.environ.get('LLM_BREAKER_WINDOW', '20')),
+                    open_seconds=float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '30'))
+                ))
+                for provider, model in parse_backends(os.environ.get('LLM_BACKENDS', 'openai/gpt-4o-mini'))
+            ],
+            overrides=parse_overrides(os.environ.get('LLM_LANGUAGE_BACKENDS', '')),
+            explore=float(os.environ.get('LLM_ROUTER_EXPLORE', '0.05'))
+        )
+        self.max_attempts = int(os.environ.get('LLM_MAX_ATTEMPTS', '2'))
+        # Budget of a single attempt; by default the call budget is split evenly so
+        # a stalled backend leaves time to fail over. 0 lets one attempt use all of it
+        self.attempt_timeout = float(os.environ.get('LLM_ATTEMPT_TIMEOUT', self.timeout / max(self.max_attempts, 1))) or None
+        self.timeouts = 0
+        self.hedges = 0
+
+        # Admission control for upstream calls; over capacity, callers get the
+        # fallback message, or AdmissionRejected (HTTP 429) when LLM_REJECT_MODE=429.
+        # LLM_RATE_LIMIT applies per worker, LLM_SHARED_RATE_LIMIT across all
+        # workers using the same shared-state backend.
+        rate_limit = float(os.environ.get('LLM_RATE_LIMIT', '0'))
+        shared_rate_limit = float(os.environ.get('LLM_SHARED_RATE_LIMIT', '0'))
+        self.admission = AdmissionController(
+            max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '32')),
+            rate=rate_limit or None,
+            burst=int(os.environ.get('LLM_RATE_BURST', '0')) or None,
+            max_queue=int(os.environ.get('LLM_MAX_QUEUE', '100')),
+            max_wait=float(os.environ.get('LLM_MAX_QUEUE_WAIT', '2.0')),
+            state=shared_state,
+            shared_rate=shared_rate_limit or None
+        )
+        self.reject_with_429 = os.environ.get('LLM_REJECT_MODE', 'fallback') == '429'
+
+    async def start(self):
         """
-        Generate an empathetic motivational message based on emotion and language.
-        
+        Open the shared LLM connection pool. Called once at application startup.
+        """
+        await self.client.start()
+
+    async def close(self):
+        """
+        Close the shared LLM connection pool. Called once at application shutdown.
+        """
+        await self.client.close()
+
+    def fallback_message(self, language: str) -> str:
+        """
+        Return the static fallback message for a language (English if unknown).
+        """
+        return fallback_message(language)
+
+    async def send(
+        self,
+        system_message: str,
+        text: str,
+        session_id: str,
+        timeout: float,
+        hedge: bool = False,
+        language: Optional[str] = None
+    ) -> str:
+        """
+        Send one prompt through admission control to the routed backends,
+        within a latency budget.
+
+        Backends are tried in the router's order for the language, skipping
+        those whose circuit breaker is open. A failed or timed-out attempt
+        fails over to the next backend while attempts and budget remain. Each
+        attempt is optionally hedged with a second request after the p95
+        latency.
+
+        Raises:
+            AdmissionRejected: If no upstream capacity frees up in time
+            CircuitOpenError: If every backend's breaker is open and nothing was attempted
+            asyncio.TimeoutError: If the budget ran out
+            Exception: The last attempt's error
+        """
+        # The budget covers the wait for admission too
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        async with self.admission.slot(max_wait=timeout):
+            backends, reason = self.router.route(language)
+            previous, error = None, None
+            attempts = 0
+            for backend in backends:
+                remaining = deadline - loop.time()
+                if attempts >= self.max_attempts or remaining <= 0:
+                    break
+                if not backend.breaker.allow():
+                    continue
+                self._record_route(backend, previous, reason)
+                attempts += 1
+                try:
+                    return await self._attempt(
+                        backend, system_message, text, session_id, min(remaining, self.attempt_timeout or remaining), hedge
+                    )
+                except Exception as e:
+                    previous, error = backend, e
+            if error is None:
+                raise CircuitOpenError("Every LLM backend's circuit breaker is open")
+            raise error
+
+    def _record_route(self, backend: LlmBackend, previous: Optional[LlmBackend], reason: str) -> None:
+        if previous is None:
+            LLM_ROUTES.inc(backend.name, reason)
+        else:
+            LLM_FAILOVERS.inc(previous.name)
+            logger.warning("Failing over from %s to %s", previous.name, backend.name)
+
+    async def _attempt(
+        self,
+        backend: LlmBackend,
+        system_message: str,
+        text: str,
+        session_id: str,
+        timeout: float,
+        hedge: bool
+    ) -> str:
+        async def call():
+            return await self.client.send(
+                system_message, text, session_id=session_id, provider=backend.provider, model=backend.model
+            )
+
+        async def hedge_call():
+            # A hedge is one more upstream call: it takes a slot of its own, and
+            # is skipped rather than queued when none is free
+            async with self.admission.slot(max_wait=0):
+                self.hedges += 1
+                return await call()
+
+        backend.attempts += 1
+        started = time.monotonic()
+        try:
+            with phase("llm", "send"):
+                if hedge:
+                    # Until there are enough samples for a p95, hedge after a fixed delay
+                    delay = self.latency.percentile(95) if len(self.latency) >= 20 else self.hedge_delay
+                    response, _ = await asyncio.wait_for(hedged(call, delay, hedge_call), timeout=timeout)
+                else:
+                    response = await asyncio.wait_for(call(), timeout=timeout)
+        except asyncio.CancelledError:
+            backend.breaker.abandon()
+            raise
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            backend.breaker.record(False)
+            backend.record(False, time.monotonic() - started)
+            LLM_ATTEMPTS.inc(backend.name, "timeout")
+            raise
+        except Exception:
+            backend.breaker.record(False)
+            backend.record(False)
+            LLM_ATTEMPTS.inc(backend.name, "error")
+            raise
+
+        elapsed = time.monotonic() - started
+        backend.breaker.record(True)
+        backend.record(True, elapsed)
+        self.latency.record(elapsed)
+        LLM_ATTEMPTS.inc(backend.name, "success")
+        return response
+
+    def stats(self) -> dict:
+        """
+        Return latency, timeout, hedging, per-backend routing and admission counters.
+        """
+        return {
+            "latency_p50_seconds": self.latency.percentile(50),
+            "latency_p95_seconds": self.latency.percentile(95),
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "backends": self.router.stats(),
+            "admission": self.admission.stats()
+        }
+
+    async def request_message(self, emotion: str, language: str, template: PromptTemplate = None) -> str:
+        """
+        Ask the LLM for a new message. Unlike generate_message, errors are raised
+        to the caller instead of being replaced by a fallback message.
+
         Args:
             emotion: The user's current emotion
             language: The language for the message
-            
+            template: Prompt template to use (the primary version if omitted)
+
         Returns:
             Generated motivational message
         """
-        try:
-            # Create a unique session ID for each request
-            session_id = f"moodmate_{emotion}_{language}_{datetime.utcnow().timestamp()}"
-            
-            # System message that defines MoodMate's personality
-            system_message = (
-                "You are MoodMate, an empathetic AI that instantly creates short motivational messages. "
-                "Your goal is to make the user feel understood, calm, and inspired - like a supportive friend. "
-                f"Always respond in the selected language: {language}. "
-                f"The user's current emotion is: {emotion}. "
-                "Write a unique 1-2 sentence message that matches their emotion and uplifts them emotionally. "
-                "Keep the tone natural, warm, and hopeful. Avoid robotic or overly generic phrases. "
-                "Add a small emoji if appropriate, but never more than two. "
-                "Return ONLY the message text, nothing else."
-            )
-            
-            # Initialize the chat
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=session_id,
-                system_message=system_message
-            ).with_model("openai", "gpt-4o-mini")
-            
-            # Create user message
-            user_message = UserMessage(
-                text=f"Generate a motivational message for someone feeling {emotion}."
+        template = template or self.prompts.primary
+        system_message, user_message = template.render(emotion, language)
+
+        # Send message through the shared client and get response
+        with PROMPT_LATENCY.time(template.version, "message"):
+            response = await self.send(
+                system_message,
+                user_message,
+                session_id=f"moodmate_{emotion}_{language}",
+                timeout=self.timeout,
+                hedge=self.hedge,
+                language=language
             )
-            
-            # Send message and get response
-            response = await chat.send_message(user_message)
-            
-            logger.info(f"Generated message for emotion={emotion}, language={language}")
-            return response.strip()
-            
+
+        logger.debug("Generated message for emotion=%s, language=%s, prompt=%s", emotion, language, template.version)
+        return response.strip()
+
+    async def stream_message(self, emotion: str, language: str, template: PromptTemplate = None) -> AsyncIterator[str]:
+        """
+        Stream a new message from the LLM chunk by chunk. A backend that fails
+        before its first chunk is failed over like in send(); later errors are
+        raised to the caller after some chunks have already been yielded.
+
+        The first chunk must arrive within the call budget (LLM_TIMEOUT) and the
+        whole message within LLM_STREAM_TIMEOUT; otherwise asyncio.TimeoutError
+        is raised, so a stalled upstream never holds the request or its slot.
+
+        Args:
+            emotion: The user's current emotion
+            language: The language for the message
+            template: Prompt template to use (the primary version if omitted)
+
+        Yields:
+            Text chunks of the generated message
+        """
+        template = template or self.prompts.primary
+        system_message, user_message = template.render(emotion, language)
+        # The first chunk must arrive within the call budget, the whole message
+        # within the stream budget; both include the wait for admission
+        loop = asyncio.get_running_loop()
+        first_chunk_deadline = loop.time() + self.timeout
+        deadline = loop.time() + self.stream_timeout
+        async with self.admission.slot(max_wait=self.timeout):
+            backends, reason = self.router.route(language)
+            previous, error = None, None
+            attempts = 0
+            for backend in backends:
+                remaining = first_chunk_deadline - loop.time()
+                if attempts >= self.max_attempts or remaining <= 0:
+                    break
+                if not backend.breaker.allow():
+                    continue
+                self._record_route(backend, previous, reason)
+                attempts += 1
+                backend.attempts += 1
+                started = time.monotonic()
+                attempt_deadline = loop.time() + min(remaining, self.attempt_timeout or remaining)
+                streamed = False
+                chunks = self.client.stream(
+                    system_message,
+                    user_message,
+                    session_id=f"moodmate_{emotion}_{language}",
+                    provider=backend.provider,
+                    model=backend.model
+                )
+                try:
+                    with phase("llm", "stream"), PROMPT_LATENCY.time(template.version, "stream"):
+                        while True:
+                            timeout = (deadline if streamed else attempt_deadline) - loop.time()
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(timeout, 0))
+                            except StopAsyncIteration:
+                                break
+                            streamed = True
+                            yield chunk
+                except (asyncio.CancelledError, GeneratorExit):
+                    backend.breaker.abandon()
+                    raise
+                except asyncio.TimeoutError as e:
+                    self.timeouts += 1
+                    backend.breaker.record(False)
+                    backend.record(False, time.monotonic() - started)
+                    LLM_ATTEMPTS.inc(backend.name, "timeout")
+                    if streamed:
+                        raise
+                    previous, error = backend, e
+                    continue
+                except Exception as e:
+                    if is_config_error(e):
+                        # A rejected stream request (key, endpoint) says nothing about the
+                        # provider's health, and must not open the breaker send() relies on
+                        backend.breaker.abandon()
+                        LLM_ATTEMPTS.inc(backend.name, "rejected")
+                    else:
+                        backend.breaker.record(False)
+                        backend.record(False)
+                        LLM_ATTEMPTS.inc(backend.name, "error")
+                    # Only a stream that has not produced any text can move to another backend
+                    if streamed:
+                        raise
+                    previous, error = backend, e
+                    continue
+                finally:
+                    await chunks.aclose()
+
+                backend.breaker.record(True)
+                backend.record(True, time.monotonic() - started)
+                LLM_ATTEMPTS.inc(backend.name, "success")
+                logger.info(
+                    "Streamed message for emotion=%s, language=%s, prompt=%s", emotion, language, template.version,
+                    extra={
+                        "emotion": emotion, "language": language,
+                        "prompt_version": template.version, "backend": backend.name
+                    }
+                )
+                return
+            if error is None:
+                raise CircuitOpenError("Every LLM backend's circuit breaker is open")
+            raise error
+
+    async def generate_message(self, emotion: str, language: str) -> tuple[str, str]:
+        """
+        Generate an empathetic motivational message based on emotion and language.
+
+        The prompt template is chosen per call by the A/B selector.
+
+        Args:
+            emotion: The user's current emotion
+            language: The language for the message
+
+        Returns:
+            (generated motivational message, prompt version used)
+        """
+        template = self.prompts.choose()
+        try:
+            message = await self.request_message(emotion, language, template)
+            PROMPT_OUTCOMES.inc(template.version, "generated")
+            return message, template.version
+
+        except AdmissionRejected:
+            if self.reject_with_429:
+                raise
+            logger.warning("Upstream over capacity, serving fallback for language=%s", language)
+            FALLBACKS.inc(*metric_labels(emotion, language))
+            PROMPT_OUTCOMES.inc(template.version, "fallback")
+            return self.fallback_message(language), template.version
+
         except Exception as e:
-            logger.error(f"Error generating message: {str(e)}")
+            logger.error("Error generating message: %s: %s", type(e).__name__, e)
             # Fallback message if AI fails
-            fallback_messages = {
-                'English': 'You are doing great. Keep going! 💙',
-                'Turkish': 'Harika gidiyorsun. Devam et! 💙',
-                'Spanish': '¡Lo estás haciendo genial. Sigue adelante! 💙',
-                'German': 'Du machst das großartig. Mach weiter! 💙',
-                'French': 'Tu fais du bon travail. Continue! 💙',
-                'Italian': 'Stai andando alla grande. Continua così! 💙',
-                'Russian': 'У тебя отлично получается. Продолжай! 💙',
-                'Arabic': 'أنت تقوم بعمل رائع. استمر! 💙',
-                'Japanese': '素晴らしいです。頑張って! 💙'
-            }
-            return fallback_messages.get(language, fallback_messages['English'])
\ No newline at end of file
+            FALLBACKS.inc(*metric_labels(emotion, language))
+            PROMPT_OUTCOMES.inc(template.version, "fallback")
+            return self.fallback_message(language), template.version
+
+    async def request_messages(self, pairs: list[tuple[str, str]], template: PromptTemplate = None) -> list:
+        """
+        Ask the LLM for one message per (emotion, language) pair in a single call.
+
+        Args:
+            pairs: The (emotion, language) pairs to generate messages for
+            template: Prompt template to use (the primary version if omitted)
+
+        Returns:
+            A list aligned with pairs; entries the model did not return are None
+        """
+        template = template or self.prompts.primary
+        system_message, user_message = template.render_batch(pairs)
+        # A batch in a single language follows that language's routing
+        languages = {language for _, language in pairs}
+        with PROMPT_LATENCY.time(template.version, "batch"):
+            response = await self.send(
+                system_message,
+                user_message,
+                session_id="moodmate_batch",
+                timeout=self.batch_timeout,
+                language=languages.pop() if len(languages) == 1 else None
+            )
+        messages = parse_message_list(response)
+
+        results = []
+        for i in range(len(pairs)):
+            message = messages[i] if i < len(messages) else None
+            results.append(message.strip() if isinstance(message, str) and message.strip() else None)
+
+        logger.info(
+            "Generated batch of %d messages, prompt=%s", len(pairs), template.version,
+            extra={"count": len(pairs), "prompt_version": template.version}
+        )
+        return results
+
+    async def generate_messages(self, pairs: list[tuple[str, str]]) -> tuple[list[str], str]:
+        """
+        Generate one message per (emotion, language) pair using batched LLM calls.
+
+        Pairs are split into batches of batch_size, each sent as one prompt.
+        Any item that fails or is missing from the response gets the fallback
+        message for its language. All batches of one call use the same prompt
+        template.
+
+        Args:
+            pairs: The (emotion, language) pairs to generate messages for
+
+        Returns:
+            (generated motivational messages in the same order as pairs, prompt version used)
+        """
+        template = self.prompts.choose()
+        batches = [pairs[i:i + self.batch_size] for i in range(0, len(pairs), self.batch_size)]
+        batch_results = await asyncio.gather(
+            *(self.request_messages(batch, template) for batch in batches),
+            return_exceptions=True
+        )
+
+        results = []
+        for batch, batch_result in zip(batches, batch_results):
+            if isinstance(batch_result, AdmissionRejected) and self.reject_with_429:
+                raise batch_result
+            if isinstance(batch_result, BaseException):
+                logger.error("Error generating message batch: %s", batch_result)
+                batch_result = [None] * len(batch)
+            for (emotion, language), message in zip(batch, batch_result):
+                if message is None:
+                    FALLBACKS.inc(*metric_labels(emotion, language))
+                    PROMPT_OUTCOMES.inc(template.version, "fallback")
+                    message = self.fallback_message(language)
+                else:
+                    PROMPT_OUTCOMES.inc(template.version, "generated")
+                results.append(message)
+        return results, template.version
@@ -0,0 +1,232 @@
+import hashlib
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Union
+
+from bson import Binary
+from pymongo import UpdateOne
+
+from pagination import keyset_filter
+
+# Stable storage codes for the emotions and languages the frontend offers.
+# Codes are persisted: never renumber or reuse one, only append. Values
+# without a code are stored as the plain string.
+EMOTION_CODES = {
+    'Happy': 1, 'Sad': 2, 'Anxious': 3, 'Stressed': 4, 'Angry': 5, 'Lonely': 6,
+    'Grateful': 7, 'Overwhelmed': 8, 'Hopeful': 9, 'Calm': 10, 'Neutral': 11
+}
+LANGUAGE_CODES = {
+    'English': 1, 'Turkish': 2, 'Spanish': 3, 'German': 4, 'French': 5,
+    'Italian': 6, 'Russian': 7, 'Arabic': 8, 'Japanese': 9
+}
+EMOTION_NAMES = {code: name for name, code in EMOTION_CODES.items()}
+LANGUAGE_NAMES = {code: name for name, code in LANGUAGE_CODES.items()}
+
+# Response fields of a saved message, in order
+SAVED_MESSAGE_PROJECTION = {
+    "_id": 0, "id": 1, "emotion": 1, "language": 1, "text": 1, "timestamp": 1, "prompt_version": 1
+}
+
+def encode_code(value: str, codes: dict) -> Union[int, str]:
+    return codes.get(value, value)
+
+def decode_code(value: Union[int, str], names: dict) -> str:
+    return names[value] if isinstance(value, int) else value
+
+def text_hash(text: str) -> bytes:
+    """
+    Content address of a message text: a 128-bit BLAKE2b digest of its UTF-8 bytes.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+class LegacyMessageStore:
+    """
+    Saved messages stored as SavedMessage documents in `saved_messages`.
+    """
+
+    collection_name = "saved_messages"
+
+    def __init__(self, db):
+        self.collection = db[self.collection_name]
+
+    async def insert_one(self, document: dict) -> None:
+        await self.collection.insert_one(document)
+
+    async def insert_many(self, documents: list, ordered: bool = False) -> None:
+        await self.collection.insert_many(documents, ordered=ordered)
+
+    async def page(
+        self,
+        emotion: Optional[str],
+        language: Optional[str],
+        after: Optional[tuple[datetime, str]],
+        limit: int
+    ) -> list[dict]:
+        """
+        Return up to `limit` messages newest first, strictly after the (timestamp, id)
+        position `after`, as response-shaped dicts.
+        """
+        query = {}
+        if emotion is not None:
+            query["emotion"] = emotion
+        if language is not None:
+            query["language"] = language
+        if after is not None:
+            query.update(keyset_filter(*after))
+        rows = await self.collection.find(query, SAVED_MESSAGE_PROJECTION).sort(
+            [("timestamp", -1), ("id", -1)]
+        ).limit(limit).to_list(length=limit)
+        # Documents saved before prompt versioning have no prompt_version
+        for row in rows:
+            row.setdefault("prompt_version", None)
+        return rows
+
+class CompactMessageStore:
+    """
+    Saved messages in a compact layout.
+
+    `saved_messages_compact` holds one small document per saved message:
+        {_id: binary UUID, t: timestamp, e: emotion code, l: language code, h: text hash,
+         p: prompt version (omitted when unknown)}
+    and `message_texts` holds each distinct text once, keyed by its hash:
+        {_id: text hash, text: str, refs: number of messages referencing it}
+
+    Binary UUIDs sort in the same order as their canonical strings, so pages and
+    cursors are identical to the legacy layout.
+    """
+
+    collection_name = "saved_messages_compact"
+    texts_collection_name = "message_texts"
+
+    def __init__(self, db):
+        self.collection = db[self.collection_name]
+        self.texts = db[self.texts_collection_name]
+
+    @staticmethod
+    def encode(document: dict) -> dict:
+        """
+        Convert a SavedMessage document into its compact form.
+        """
+        compact = {
+            "_id": Binary.from_uuid(uuid.UUID(document["id"])),
+            "t": document["timestamp"],
+            "e": encode_code(document["emotion"], EMOTION_CODES),
+            "l": encode_code(document["language"], LANGUAGE_CODES),
+            "h": text_hash(document["text"])
+        }
+        if document.get("prompt_version") is not None:
+            compact["p"] = document["prompt_version"]
+        return compact
+
+    @staticmethod
+    def decode(document: dict, texts: dict) -> dict:
+        """
+        Convert a compact document back into the response shape.
+        """
+        return {
+            "id": str(uuid.UUID(bytes=bytes(document["_id"]))),
+            "emotion": decode_code(document["e"], EMOTION_NAMES),
+            "language": decode_code(document["l"], LANGUAGE_NAMES),
+            "text": texts[document["h"]],
+            "timestamp": document["t"],
+            "prompt_version": document.get("p")
+        }
+
+    async def insert_one(self, document: dict) -> None:
+        await self.insert_many([document])
+
+    async def insert_many(self, documents: list, ordered: bool = False) -> None:
+        """
+        Intern the texts, then insert the compact documents.
+
+        Texts are written first so a message never references a missing text.
+        If the message insert fails afterwards, the reference counts overstate
+        usage until recount_refs() runs; they are never understated.
+        """
+        texts = {}
+        refs = Counter()
+        for document in documents:
+            digest = text_hash(document["text"])
+            texts[digest] = document["text"]
+            refs[digest] += 1
+        await self.texts.bulk_write([
+            UpdateOne({"_id": digest}, {"$setOnInsert": {"text": texts[digest]}, "$inc": {"refs": count}}, upsert=True)
+            for digest, count in refs.items()
+        ], ordered=False)
+        await self.collection.insert_many([self.encode(document) for document in documents], ordered=ordered)
+
+    async def page(
+        self,
+        emotion: Optional[str],
+        language: Optional[str],
+        after: Optional[tuple[datetime, str]],
+        limit: int
+    ) -> list[dict]:
+        """
+        Return up to `limit` messages newest first, strictly after the (timestamp, id)
+        position `after`, as response-shaped dicts.
+
+        Raises:
+            ValueError: If the id in `after` is not a UUID
+        """
+        query = {}
+        if emotion is not None:
+            query["e"] = encode_code(emotion, EMOTION_CODES)
+        if language is not None:
+            query["l"] = encode_code(language, LANGUAGE_CODES)
+        if after is not None:
+            timestamp, message_id = after
+            try:
+                position = Binary.from_uuid(uuid.UUID(message_id))
+            except ValueError as e:
+                raise ValueError(f"Invalid cursor id: {message_id}") from e
+            query.update(keyset_filter(timestamp, position, time_field="t", id_field="_id"))
+
+        documents = await self.collection.find(query).sort([("t", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+        if not documents:
+            return []
+
+        hashes = list({document["h"] for document in documents})
+        texts = {
+            text["_id"]: text["text"]
+            for text in await self.texts.find({"_id": {"$in": hashes}}, {"text": 1}).to_list(length=None)
+        }
+        return [self.decode(document, texts) for document in documents]
+
+    async def recount_refs(self) -> int:
+        """
+        Recompute every text's reference count from the message documents.
+
+        Run while no saves are in flight against this layout.
+
+        Returns:
+            Number of texts whose count changed
+        """
+        counts = {
+            group["_id"]: group["refs"]
+            for group in await self.collection.aggregate(
+                [{"$group": {"_id": "$h", "refs": {"$sum": 1}}}]
+            ).to_list(length=None)
+        }
+        updates = []
+        async for text in self.texts.find({}, {"refs": 1}):
+            refs = counts.get(text["_id"], 0)
+            if text.get("refs") != refs:
+                updates.append(UpdateOne({"_id": text["_id"]}, {"$set": {"refs": refs}}))
+        if updates:
+            await self.texts.bulk_write(updates, ordered=False)
+        return len(updates)
+
+MESSAGE_STORES = {
+    "legacy": LegacyMessageStore,
+    "compact": CompactMessageStore
+}
+
+def create_message_store(db, layout: str):
+    """
+    Build the message store for a layout name ("legacy" or "compact").
+    """
+    if layout not in MESSAGE_STORES:
+        raise ValueError(f"Unknown message storage layout: {layout}")
+    return MESSAGE_STORES[layout](db)
@@ -0,0 +1,220 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+class Registry:
+    """
+    Minimal Prometheus text-format registry: counters and histograms updated on
+    the hot path, plus collector callbacks that report gauges at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list[Callable[[], Iterable[tuple]]] = []
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[tuple]]) -> Callable:
+        """
+        Register fn as a gauge source; it yields (name, help, labels dict, value).
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        described = set()
+        for fn in self._collectors:
+            for name, help, labels, value in fn():
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {help}")
+                    lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "moodmate_request_duration_seconds", "End-to-end request latency per route", ("method", "route", "status")
+)
+PHASE_LATENCY = REGISTRY.histogram(
+    "moodmate_phase_duration_seconds", "Time spent per phase (llm, db, validation)", ("phase", "operation")
+)
+FALLBACKS = REGISTRY.counter(
+    "moodmate_fallbacks_total", "Fallback messages served", ("emotion", "language")
+)
+CACHE_HITS = REGISTRY.counter(
+    "moodmate_cache_hits_total", "Messages served without an LLM call", ("source", "emotion", "language")
+)
+ERRORS = REGISTRY.counter(
+    "moodmate_errors_total", "Errors per route", ("route", "emotion", "language")
+)
+NOT_MODIFIED = REGISTRY.counter(
+    "moodmate_not_modified_total", "Requests answered 304 Not Modified per route", ("route",)
+)
+LLM_ROUTES = REGISTRY.counter(
+    "moodmate_llm_routes_total", "LLM calls per first-choice backend and reason (fastest, override, explore, only)",
+    ("backend", "reason")
+)
+LLM_ATTEMPTS = REGISTRY.counter(
+    "moodmate_llm_attempts_total", "LLM attempts per backend and outcome (success, error, timeout, rejected)", ("backend", "outcome")
+)
+LLM_FAILOVERS = REGISTRY.counter(
+    "moodmate_llm_failovers_total", "LLM calls moved to another backend after this one failed", ("backend",)
+)
+PROMPT_OUTCOMES = REGISTRY.counter(
+    "moodmate_prompt_outcomes_total", "LLM calls per prompt version and outcome (generated, fallback)",
+    ("prompt_version", "outcome")
+)
+PROMPT_LATENCY = REGISTRY.histogram(
+    "moodmate_prompt_duration_seconds", "LLM call latency per prompt version", ("prompt_version", "operation")
+)
+
+# Per-request phase durations, read by the Server-Timing middleware
+_request_phases: ContextVar[Optional[dict]] = ContextVar("request_phases", default=None)
+
+def start_request_phases() -> dict:
+    phases: dict[str, float] = {}
+    _request_phases.set(phases)
+    return phases
+
+@contextmanager
+def phase(name: str, operation: str):
+    """
+    Time a block as one phase of the current request (llm, db, validation),
+    recording it in the phase histogram and the request's Server-Timing.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        PHASE_LATENCY.observe(elapsed, name, operation)
+        phases = _request_phases.get()
+        if phases is not None:
+            phases[name] = phases.get(name, 0.0) + elapsed
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records end-to-end latency per route template and adds
+    a Server-Timing header with the request's phase breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases = start_request_phases()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(phases, time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status)
+            )
+
+def server_timing(phases: dict, total: float) -> str:
+    """
+    Format phase durations as a Server-Timing header value; time not covered by
+    a phase (routing, serialization, middleware) is reported as `app`.
+    """
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+    entries.append(f"app;dur={max(total - sum(phases.values()), 0) * 1000:.2f}")
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
\ No newline at end of file
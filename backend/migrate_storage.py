@@ -0,0 +1,115 @@
+"""
+Migrate saved messages from the legacy layout to the compact layout.
+
+Copies every document in `saved_messages` into `saved_messages_compact` and
+`message_texts` (see message_store.CompactMessageStore), in batches. Messages
+already present in the compact layout are skipped, so the migration can be
+stopped and re-run at any time. The legacy collection is left untouched.
+
+Typical rollout:
+    1. python migrate_storage.py                 # copy existing messages
+    2. set MESSAGE_STORAGE=compact and restart   # new saves use the compact layout
+    3. python migrate_storage.py                 # copy messages saved in between
+    4. drop saved_messages once satisfied
+
+Use --recount to repair text reference counts (e.g. after an interrupted run)
+while no saves are in flight.
+
+Usage (from backend/):
+    python migrate_storage.py [--batch-size 500] [--dry-run] [--recount]
+
+Reads MONGO_URL and DB_NAME from the environment or backend/.env.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+
+from bson import Binary
+from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError
+
+from message_store import CompactMessageStore, LegacyMessageStore
+
+logger = logging.getLogger(__name__)
+
+async def collection_size(db, name: str) -> dict:
+    """
+    Data and index size of a collection in bytes, when the server reports them.
+    """
+    try:
+        stats = await db.command("collStats", name)
+        return {"count": stats.get("count"), "size": stats.get("size"), "index_size": stats.get("totalIndexSize")}
+    except Exception as e:
+        logger.warning(f"collStats for {name} unavailable: {str(e)}")
+        return {}
+
+async def migrate(db, batch_size: int, dry_run: bool) -> dict:
+    legacy = LegacyMessageStore(db)
+    compact = CompactMessageStore(db)
+    stats = {"scanned": 0, "migrated": 0, "skipped": 0, "failed": 0}
+
+    async def flush(batch: list) -> None:
+        ids = [Binary.from_uuid(uuid.UUID(document["id"])) for document in batch]
+        existing = {
+            bytes(document["_id"])
+            for document in await compact.collection.find({"_id": {"$in": ids}}, {"_id": 1}).to_list(length=None)
+        }
+        pending = [document for document, _id in zip(batch, ids) if bytes(_id) not in existing]
+        stats["skipped"] += len(batch) - len(pending)
+        if not pending or dry_run:
+            stats["migrated"] += len(pending)
+            return
+        try:
+            await compact.insert_many(pending, ordered=False)
+            stats["migrated"] += len(pending)
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            stats["migrated"] += inserted
+            stats["failed"] += len(pending) - inserted
+            logger.error(f"Batch wrote {inserted}/{len(pending)} messages: {str(e)}")
+
+    batch = []
+    # _id order is insertion order, so an interrupted run resumes over the same sequence
+    async for document in legacy.collection.find({}, {"_id": 0}).sort("_id", 1):
+        stats["scanned"] += 1
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+            logger.info(f"Scanned {stats['scanned']} messages")
+    if batch:
+        await flush(batch)
+    return stats
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="messages per insert batch")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be migrated without writing")
+    parser.add_argument("--recount", action="store_true", help="recompute text reference counts afterwards")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        report = {"dry_run": args.dry_run, **await migrate(db, args.batch_size, args.dry_run)}
+        if args.recount and not args.dry_run:
+            report["recounted"] = await CompactMessageStore(db).recount_refs()
+        report["sizes"] = {
+            name: await collection_size(db, name)
+            for name in (LegacyMessageStore.collection_name, CompactMessageStore.collection_name,
+                         CompactMessageStore.texts_collection_name)
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
 from datetime import datetime
 import uuid
@@ -12,11 +12,38 @@ class MessageGenerateResponse(BaseModel):
     emotion: str
     language: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    # Prompt template version the message was generated with
+    prompt_version: Optional[str] = None
+
+class MessagesGenerateRequest(BaseModel):
+    # Either a list of (emotion, language) pairs, or one pair with a count
+    items: Optional[list[MessageGenerateRequest]] = Field(default=None, max_length=20)
+    emotion: Optional[str] = None
+    language: Optional[str] = None
+    count: int = Field(default=1, ge=1, le=20)
+
+    @model_validator(mode='after')
+    def check_items_or_pair(self):
+        if self.items is None and (self.emotion is None or self.language is None):
+            raise ValueError("Provide either 'items' or both 'emotion' and 'language'")
+        if self.items is not None and not self.items:
+            raise ValueError("'items' must not be empty")
+        return self
+
+    def pairs(self) -> list[tuple[str, str]]:
+        if self.items is not None:
+            return [(item.emotion, item.language) for item in self.items]
+        return [(self.emotion, self.language)] * self.count
+
+class MessagesGenerateResponse(BaseModel):
+    messages: list[MessageGenerateResponse]
 
 class SaveMessageRequest(BaseModel):
     emotion: str
     language: str
     message: str
+    # prompt_version from the MessageGenerateResponse being saved
+    prompt_version: Optional[str] = None
 
 class SaveMessageResponse(BaseModel):
     id: str
@@ -28,6 +55,9 @@ class SavedMessage(BaseModel):
     language: str
     text: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    prompt_version: Optional[str] = None
 
 class SavedMessagesResponse(BaseModel):
-    messages: list[SavedMessage]
\ No newline at end of file
+    messages: list[SavedMessage]
+    # Opaque cursor for the next page; None on the last page
+    next_cursor: Optional[str] = None
\ No newline at end of file
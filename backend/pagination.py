@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+def encode_cursor(timestamp: datetime, message_id: str) -> str:
+    """
+    Encode the (timestamp, id) position of the last item on a page as an opaque cursor.
+    """
+    payload = json.dumps({"t": timestamp.isoformat(), "id": message_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def keyset_filter(
+    timestamp: datetime,
+    message_id: Any,
+    time_field: str = "timestamp",
+    id_field: str = "id"
+) -> dict:
+    """
+    Build the Mongo filter for items strictly after a cursor in (timestamp, id) descending order.
+    """
+    return {
+        "$or": [
+            {time_field: {"$lt": timestamp}},
+            {time_field: timestamp, id_field: {"$lt": message_id}}
+        ]
+    }
@@ -0,0 +1,167 @@
+"""
+Fill the message corpus served by the API.
+
+For every supported emotion and every language with a fallback message,
+tops the `message_corpus` collection up to --per-pair messages for the current
+prompt version (PROMPT_VERSION). Messages are generated with batched LLM calls
+(several per prompt), at most --concurrency calls at a time. Near-identical outputs are
+dropped before loading. Pairs already at target are skipped, so the job can
+run on a schedule and resumes where an interrupted run stopped.
+
+Usage (from backend/):
+    python prewarm.py --per-pair 20 --concurrency 4
+    python prewarm.py --dry-run
+    python prewarm.py --emotions Happy,Sad --languages English
+
+Requires the same environment as the server (MONGO_URL, DB_NAME, EMERGENT_LLM_KEY).
+Set CORPUS_ENABLED=true on the server to serve from the corpus.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from message_corpus import MessageCorpus, is_near_duplicate, trigrams
+from message_service import FALLBACK_MESSAGES, SUPPORTED_EMOTIONS
+from prompts import create_prompt_selector
+
+logger = logging.getLogger(__name__)
+
+async def top_up(
+    service,
+    corpus: MessageCorpus,
+    emotion: str,
+    language: str,
+    need: int,
+    semaphore: asyncio.Semaphore,
+    similarity: float,
+    max_rounds: int
+) -> dict:
+    """
+    Generate and store up to `need` new messages for one pair.
+    """
+    result = {"generated": 0, "duplicates": 0, "added": 0, "errors": 0}
+    seen = [trigrams(text) for text in await corpus.texts(emotion, language)]
+
+    for _ in range(max_rounds):
+        if result["added"] >= need:
+            break
+        remaining = need - result["added"]
+        batches = [min(service.batch_size, remaining - i) for i in range(0, remaining, service.batch_size)]
+
+        async def generate(size: int) -> list:
+            async with semaphore:
+                return await service.request_messages([(emotion, language)] * size)
+
+        outputs = await asyncio.gather(*(generate(size) for size in batches), return_exceptions=True)
+
+        fresh = []
+        for output in outputs:
+            if isinstance(output, BaseException):
+                result["errors"] += 1
+                logger.error(f"Generation failed for {emotion}/{language}: {str(output)}")
+                continue
+            for text in output:
+                if text is None:
+                    continue
+                result["generated"] += 1
+                shingles = trigrams(text)
+                if is_near_duplicate(shingles, seen, similarity):
+                    result["duplicates"] += 1
+                    continue
+                seen.append(shingles)
+                fresh.append(text)
+
+        # Load each round right away so an interrupted run keeps its progress
+        added = await corpus.add(emotion, language, fresh[:remaining])
+        result["duplicates"] += len(fresh[:remaining]) - added
+        result["added"] += added
+        if not fresh and all(isinstance(output, BaseException) for output in outputs):
+            break
+
+    logger.info(f"Corpus {emotion}/{language}: added {result['added']}/{need}")
+    return result
+
+async def prewarm(service, corpus: MessageCorpus, pairs: list, args) -> dict:
+    counts = await corpus.counts()
+    deficits = {pair: args.per_pair - counts.get(pair, 0) for pair in pairs}
+    deficits = {pair: need for pair, need in deficits.items() if need > 0}
+    report = {
+        "prompt_version": corpus.prompt_version,
+        "target_per_pair": args.per_pair,
+        "pairs": len(pairs),
+        "pairs_below_target": len(deficits),
+        "missing": sum(deficits.values())
+    }
+    if args.dry_run or not deficits:
+        report["below_target"] = {f"{emotion}/{language}": need for (emotion, language), need in deficits.items()}
+        return report
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = await asyncio.gather(*(
+        top_up(service, corpus, emotion, language, need, semaphore, args.similarity, args.max_rounds)
+        for (emotion, language), need in deficits.items()
+    ))
+    report["results"] = {f"{emotion}/{language}": result for (emotion, language), result in zip(deficits, results)}
+    for key in ("generated", "duplicates", "added", "errors"):
+        report[key] = sum(result[key] for result in results)
+    return report
+
+def selected(values: str, allowed) -> list:
+    if not values:
+        return list(allowed)
+    chosen = [value.strip() for value in values.split(",")]
+    unknown = [value for value in chosen if value not in allowed]
+    if unknown:
+        raise SystemExit(f"Unknown values: {', '.join(unknown)}")
+    return chosen
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-pair", type=int, default=20, help="target number of messages per emotion/language")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum concurrent LLM calls")
+    parser.add_argument("--similarity", type=float, default=0.8,
+                        help="trigram Jaccard similarity at which a message counts as a duplicate")
+    parser.add_argument("--max-rounds", type=int, default=3, help="generation rounds per pair before giving up")
+    parser.add_argument("--emotions", help="comma-separated subset of emotions")
+    parser.add_argument("--languages", help="comma-separated subset of languages")
+    parser.add_argument("--dry-run", action="store_true", help="only report the pairs below target")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    pairs = [
+        (emotion, language)
+        for emotion in selected(args.emotions, SUPPORTED_EMOTIONS)
+        for language in selected(args.languages, FALLBACK_MESSAGES)
+    ]
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from indexes import IndexManager
+    from message_service import MessageGenerationService
+
+    # The corpus is generated with, and served for, the primary prompt version
+    prompts = create_prompt_selector()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    corpus = MessageCorpus(db.message_corpus, prompts.primary.version)
+    service = None
+    try:
+        # The fingerprint index is what keeps duplicates out
+        await IndexManager(db).ensure_indexes()
+        if not args.dry_run:
+            service = MessageGenerationService(prompts=prompts)
+            await service.start()
+        print(json.dumps(await prewarm(service, corpus, pairs, args), indent=2, ensure_ascii=False))
+    finally:
+        if service is not None:
+            await service.close()
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+import math
+import os
+import random
+import string
+from typing import Optional
+
+# Version used when PROMPT_VERSION is not set
+DEFAULT_PROMPT_VERSION = "v1"
+
+class PromptTemplate:
+    """
+    A versioned prompt: system and user message templates for single messages,
+    plus the system message and per-item line for batched generation.
+
+    Templates are checked once at construction, and the rendered messages for
+    each (emotion, language) pair are kept, so a call costs a dict lookup
+    instead of re-formatting the prompt.
+    """
+
+    FIELDS = {"emotion", "language"}
+    BATCH_FIELDS = {"index", "emotion", "language"}
+
+    def __init__(self, version: str, system: str, user: str, batch_system: str, batch_item: str, max_rendered: int = 1024):
+        _check_fields(system, self.FIELDS)
+        _check_fields(user, self.FIELDS)
+        _check_fields(batch_item, self.BATCH_FIELDS)
+        self.version = version
+        self.system = system
+        self.user = user
+        self.batch_system = batch_system
+        self.batch_item = batch_item
+        self.max_rendered = max_rendered
+        self._rendered: dict[tuple[str, str], tuple[str, str]] = {}
+        # Mean prompt tokens per call, set by prompt_tokens()
+        self.tokens: Optional[float] = None
+
+    def render(self, emotion: str, language: str) -> tuple[str, str]:
+        """
+        Return the (system message, user message) for one pair.
+        """
+        key = (emotion, language)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = (
+                self.system.format(emotion=emotion, language=language),
+                self.user.format(emotion=emotion, language=language)
+            )
+            # Only a bounded number of pairs is kept; arbitrary client values are rendered each time
+            if len(self._rendered) < self.max_rendered:
+                self._rendered[key] = rendered
+        return rendered
+
+    def render_batch(self, pairs: list[tuple[str, str]]) -> tuple[str, str]:
+        """
+        Return the (system message, user message) asking for one message per pair.
+        """
+        lines = "\n".join(
+            self.batch_item.format(index=i, emotion=emotion, language=language)
+            for i, (emotion, language) in enumerate(pairs, start=1)
+        )
+        return self.batch_system, f"Generate {len(pairs)} motivational messages:\n{lines}"
+
+    def prompt_tokens(self, pairs) -> float:
+        """
+        Mean input tokens (system + user message) over the given pairs; measured once.
+        """
+        if self.tokens is None:
+            counts = [sum(count_tokens(text) for text in self.render(emotion, language)) for emotion, language in pairs]
+            self.tokens = sum(counts) / len(counts) if counts else 0.0
+        return self.tokens
+
+def _check_fields(template: str, allowed: set) -> None:
+    fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+    if not fields <= allowed:
+        raise ValueError(f"Unknown prompt template fields: {', '.join(sorted(fields - allowed))}")
+
+TEMPLATES = {
+    # Original prompt: the pair is interpolated into a long system message
+    "v1": PromptTemplate(
+        "v1",
+        system=(
+            "You are MoodMate, an empathetic AI that instantly creates short motivational messages. "
+            "Your goal is to make the user feel understood, calm, and inspired - like a supportive friend. "
+            "Always respond in the selected language: {language}. "
+            "The user's current emotion is: {emotion}. "
+            "Write a unique 1-2 sentence message that matches their emotion and uplifts them emotionally. "
+            "Keep the tone natural, warm, and hopeful. Avoid robotic or overly generic phrases. "
+            "Add a small emoji if appropriate, but never more than two. "
+            "Return ONLY the message text, nothing else."
+        ),
+        user="Generate a motivational message for someone feeling {emotion}.",
+        batch_system=(
+            "You are MoodMate, an empathetic AI that instantly creates short motivational messages. "
+            "Your goal is to make the user feel understood, calm, and inspired - like a supportive friend. "
+            "You will receive a numbered list of requests, each with an emotion and a language. "
+            "For each request write a unique 1-2 sentence message in that language that matches the emotion "
+            "and uplifts the user emotionally. Never repeat a message. "
+            "Keep the tone natural, warm, and hopeful. Avoid robotic or overly generic phrases. "
+            "Add a small emoji if appropriate, but never more than two. "
+            "Return ONLY a JSON array of strings, one message per request, in the same order."
+        ),
+        batch_item="{index}. emotion: {emotion}, language: {language}"
+    ),
+    # Compact prompt: a short static system message (identical on every call,
+    # so upstream prefix caching applies) and the pair only in the user message
+    "v2": PromptTemplate(
+        "v2",
+        system=(
+            "You are MoodMate, a warm, supportive friend. Write one unique 1-2 sentence message "
+            "in the given language that fits the user's emotion and uplifts them. "
+            "Natural tone, not generic, at most two emoji. Reply with the message only."
+        ),
+        user="Emotion: {emotion}\nLanguage: {language}",
+        batch_system=(
+            "You are MoodMate, a warm, supportive friend. For each numbered request, write a unique "
+            "1-2 sentence message in its language that fits its emotion and uplifts the user. "
+            "Natural tone, not generic, at most two emoji. "
+            "Reply with a JSON array of strings only, one per request, in order."
+        ),
+        batch_item="{index}. {emotion}, {language}"
+    )
+}
+
+_encoding = None
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # tiktoken is missing or cannot fetch its vocabulary
+            _encoding = False
+    return _encoding
+
+def tokenizer_name() -> str:
+    """
+    Name of the tokenizer count_tokens uses: "o200k_base", or "estimate".
+    """
+    return "o200k_base" if _get_encoding() else "estimate"
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with the gpt-4o tokenizer when tiktoken is available, otherwise
+    estimate them at four UTF-8 bytes per token.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+class PromptSelector:
+    """
+    Picks the prompt template per LLM call: the primary version, or for
+    variant_percent percent of calls the variant version (A/B test).
+    """
+
+    def __init__(self, primary: str = DEFAULT_PROMPT_VERSION, variant: Optional[str] = None, variant_percent: float = 0.0):
+        for version in (primary, variant):
+            if version is not None and version not in TEMPLATES:
+                raise ValueError(f"Unknown prompt version: {version}")
+        self.primary = TEMPLATES[primary]
+        self.variant = TEMPLATES[variant] if variant and variant_percent > 0 else None
+        self.variant_percent = min(max(variant_percent, 0.0), 100.0) if self.variant is not None else 0.0
+
+    def choose(self) -> PromptTemplate:
+        if self.variant is not None and random.random() * 100 < self.variant_percent:
+            return self.variant
+        return self.primary
+
+    def templates(self) -> list[PromptTemplate]:
+        return [self.primary] + ([self.variant] if self.variant is not None else [])
+
+def create_prompt_selector() -> PromptSelector:
+    """
+    Build the selector from PROMPT_VERSION, PROMPT_AB_VERSION and PROMPT_AB_PERCENT.
+    """
+    return PromptSelector(
+        primary=os.environ.get('PROMPT_VERSION', DEFAULT_PROMPT_VERSION),
+        variant=os.environ.get('PROMPT_AB_VERSION') or None,
+        variant_percent=float(os.environ.get('PROMPT_AB_PERCENT', '0'))
+    )
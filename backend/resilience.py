@@ -0,0 +1,160 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling upstream while the circuit breaker is open.
+    """
+
+class LatencyTracker:
+    """
+    Rolling window of recent call latencies, used to pick the hedging delay.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Return the q-th percentile (0-100) of the window, or None when it is empty.
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker.
+
+    Closed: calls pass and outcomes are recorded over a rolling window. When at
+    least min_requests outcomes are recorded and the error rate reaches
+    error_rate, the breaker opens and calls fail fast for open_seconds. It then
+    turns half-open and lets one probe through; a successful probe closes it,
+    and a failed one reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        error_rate: float = 0.5,
+        min_requests: int = 10,
+        window: int = 20,
+        open_seconds: float = 30.0
+    ):
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+        self.short_circuited = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Return True if a call may go upstream now.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record(self, success: bool) -> None:
+        """
+        Record the outcome of a call that allow() let through.
+        """
+        if self._state == self.HALF_OPEN:
+            self._probing = False
+            if success:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                logger.info("Circuit breaker closed after a successful probe")
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.error_rate:
+            self._open()
+
+    def abandon(self) -> None:
+        """
+        Forget a call that allow() let through but that ended without an outcome
+        (e.g. cancelled), so a half-open breaker can send another probe.
+        """
+        if self._state == self.HALF_OPEN:
+            self._probing = False
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+        logger.warning("Circuit breaker opened for %ss", self.open_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited
+        }
+
+async def hedged(call: Callable[[], Awaitable], delay: float, hedge_call: Optional[Callable[[], Awaitable]] = None):
+    """
+    Run call(); if it has not finished after delay seconds, start a second
+    identical call (hedge_call, if given) and return whichever succeeds first.
+    A hedge that fails does not affect the first call.
+
+    Returns:
+        (result, hedge_fired)
+    """
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result(), False
+
+        tasks.append(asyncio.ensure_future((hedge_call or call)()))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True
+                error = task.exception()
+        raise error
+    finally:
+        # Also runs when the caller's deadline cancels us
+        for task in tasks:
+            if not task.done():
+                task.cancel()
\ No newline at end of file
@@ -0,0 +1,197 @@
+import random
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+def cache_key(emotion: str, language: str, prompt_version: str) -> str:
+    """
+    Normalize (emotion, language, prompt version) into a cache key.
+    """
+    return f"{prompt_version}:{emotion.strip().lower()}:{language.strip().lower()}"
+
+class MemoryCacheBackend:
+    """
+    In-process cache storage: per-key lists of distinct (text, expires_at),
+    LRU-evicted by key once the stored text exceeds max_bytes or max_keys.
+    """
+
+    def __init__(self, max_bytes: int = 1_000_000, max_keys: int = 1024):
+        self.max_bytes = max_bytes
+        self.max_keys = max_keys
+        self._entries: OrderedDict[str, list[tuple[str, float]]] = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    async def entries(self, key: str) -> list[str]:
+        stored = self._entries.get(key)
+        if stored is None:
+            return []
+        self._entries.move_to_end(key)
+        now = time.monotonic()
+        live = [(text, expires_at) for text, expires_at in stored if expires_at > now]
+        if len(live) != len(stored):
+            self._bytes -= sum(len(text.encode()) for text, expires_at in stored if expires_at <= now)
+            self._entries[key] = live
+        return [text for text, _ in live]
+
+    async def add(self, key: str, text: str, ttl: float, max_entries: int) -> None:
+        stored = self._entries.setdefault(key, [])
+        self._entries.move_to_end(key)
+        now = time.monotonic()
+        if any(held == text and expires_at > now for held, expires_at in stored):
+            return
+        stored.append((text, now + ttl))
+        self._bytes += len(text.encode())
+        while len(stored) > max_entries:
+            oldest, _ = stored.pop(0)
+            self._bytes -= len(oldest.encode())
+
+        # Evict least recently used keys until within the memory cap
+        while (self._bytes > self.max_bytes or len(self._entries) > self.max_keys) and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= sum(len(text.encode()) for text, _ in evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "keys": len(self._entries),
+            "entries": sum(len(stored) for stored in self._entries.values()),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
+
+class MongoCacheBackend:
+    """
+    Shared cache storage in a Mongo collection, so every worker sees the same
+    warm entries. Expiry is enforced on read and by a TTL index on expires_at;
+    a key holds each live text at most once.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def entries(self, key: str) -> list[str]:
+        documents = await self.collection.find(
+            {"key": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "text": 1}
+        ).to_list(length=None)
+        return [document["text"] for document in documents]
+
+    async def add(self, key: str, text: str, ttl: float, max_entries: int) -> None:
+        now = datetime.utcnow()
+        # Insert unless the key already holds this text
+        await self.collection.update_one(
+            {"key": key, "text": text, "expires_at": {"$gt": now}},
+            {"$setOnInsert": {"created_at": now, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+        # Keep only the newest max_entries for the key
+        stale = await self.collection.find({"key": key}, {"_id": 1}).sort(
+            "created_at", -1
+        ).skip(max_entries).to_list(length=None)
+        if stale:
+            await self.collection.delete_many({"_id": {"$in": [document["_id"] for document in stale]}})
+
+    def stats(self) -> dict:
+        return {"backend": "mongo"}
+
+class ResponseCache:
+    """
+    Cache of recent LLM outputs per (emotion, language, prompt version).
+
+    Each key keeps a small rotating set of messages. A lookup only hits once a
+    key holds at least min_entries distinct live messages, and then returns a
+    random one that differs from the last message served for that key, so
+    users don't see the same text twice in a row. New LLM outputs push out the oldest entries,
+    and entries expire after ttl seconds.
+
+    A refresh_rate share of would-be hits is reported as a miss instead, so the
+    caller asks the LLM and stores a new output; without it a warm key would
+    serve the same few messages until they expire.
+    """
+
+    def __init__(
+        self,
+        backend,
+        prompt_version: str,
+        ttl: float = 3600.0,
+        max_entries_per_key: int = 8,
+        min_entries: int = 3,
+        refresh_rate: float = 0.2
+    ):
+        self.backend = backend
+        self.prompt_version = prompt_version
+        self.ttl = ttl
+        self.max_entries_per_key = max_entries_per_key
+        self.min_entries = max(min_entries, 1)
+        self.refresh_rate = refresh_rate
+        self._last_served: dict[str, str] = {}
+        self._max_tracked_keys = 4096
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    async def get(self, emotion: str, language: str) -> Optional[str]:
+        """
+        Return a cached message for the pair, or None on a miss or refresh.
+        """
+        key = cache_key(emotion, language, self.prompt_version)
+        try:
+            entries = await self.backend.entries(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Response cache lookup failed: %s", e)
+            entries = []
+
+        candidates = [text for text in entries if text != self._last_served.get(key)]
+        if len(entries) < self.min_entries or not candidates:
+            self.misses += 1
+            return None
+        if random.random() < self.refresh_rate:
+            self.refreshes += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        text = random.choice(candidates)
+        self._remember(key, text)
+        return text
+
+    async def put(self, emotion: str, language: str, text: str) -> None:
+        """
+        Store a fresh LLM output for the pair.
+        """
+        key = cache_key(emotion, language, self.prompt_version)
+        self._remember(key, text)
+        try:
+            await self.backend.add(key, text, self.ttl, self.max_entries_per_key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Response cache store failed: %s", e)
+
+    def _remember(self, key: str, text: str) -> None:
+        if key not in self._last_served and len(self._last_served) >= self._max_tracked_keys:
+            self._last_served.pop(next(iter(self._last_served)))
+        self._last_served[key] = text
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters together with backend storage counters.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "hit_ratio": self.hits / total if total else 0.0,
+            **self.backend.stats()
+        }
\ No newline at end of file
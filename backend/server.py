@@ -1,47 +1,454 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
 import os
+import json
+import math
+import orjson
+import asyncio
+import importlib
 import logging
+import threading
 from pathlib import Path
+from typing import Optional
 from models import (
     MessageGenerateRequest,
     MessageGenerateResponse,
+    MessagesGenerateRequest,
+    MessagesGenerateResponse,
     SaveMessageRequest,
     SaveMessageResponse,
     SavedMessage,
     SavedMessagesResponse
 )
-from message_service import MessageGenerationService
+from message_service import (
+    MessageGenerationService,
+    FALLBACK_MESSAGES,
+    SUPPORTED_EMOTIONS,
+    fallback_message,
+    metric_labels
+)
+from prompts import PromptSelector, create_prompt_selector
+from indexes import IndexManager
+from pagination import encode_cursor, decode_cursor
+from http_cache import PageCache, etag, etag_matches
+from message_store import create_message_store
+from message_corpus import MessageCorpus
+from shared_state import create_shared_state
+from message_pool import MessagePool
+from single_flight import SingleFlight
+from write_behind import WriteBehindQueue
+from admission import AdmissionRejected
+from metrics import REGISTRY, CACHE_HITS, ERRORS, FALLBACKS, NOT_MODIFIED, PROMPT_OUTCOMES, MetricsMiddleware, phase
+from response_cache import ResponseCache, MemoryCacheBackend, MongoCacheBackend
+from log_config import LogPipeline
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+logger = logging.getLogger(__name__)
+
+# Per-worker resources. Nothing is read from the environment or connected at
+# import time; the lifespan handler below creates these on startup.
+log_pipeline: Optional[LogPipeline] = None
+client = None
+db = None
+prompts: Optional[PromptSelector] = None
+index_manager: Optional[IndexManager] = None
+message_store = None
+message_corpus: Optional[MessageCorpus] = None
+shared_state = None
+write_behind: Optional[WriteBehindQueue] = None
+saved_pages: Optional[PageCache] = None
+single_flight: Optional[SingleFlight] = None
+response_cache: Optional[ResponseCache] = None
+
+# Set once the LLM stack has been imported and the service has started
+message_service: Optional[MessageGenerationService] = None
+message_pool: Optional[MessagePool] = None
+startup_errors: dict[str, str] = {}
+
+# Shared-state version of the saved messages; advanced after every save lands
+SAVED_MESSAGES_VERSION = "saved_messages"
+
+# Every (emotion, language) pair the frontend offers
+PROMPT_PAIRS = [(emotion, language) for emotion in SUPPORTED_EMOTIONS for language in FALLBACK_MESSAGES]
+
+# Static response bodies, serialized once
+ROOT_BODY = orjson.dumps({"message": "MoodMate API is running"})
+LIVE_BODY = orjson.dumps({"status": "alive"})
+
+def sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+# Stream `fallback` event per language, built once
+FALLBACK_EVENTS = {
+    language: sse_event("fallback", json.dumps({"text": text}, ensure_ascii=False))
+    for language, text in FALLBACK_MESSAGES.items()
+}
+
+def fallback_event(language: str) -> str:
+    return FALLBACK_EVENTS.get(language, FALLBACK_EVENTS['English'])
+
+def env_flag(name: str, default: str = 'false') -> bool:
+    return os.environ.get(name, default).lower() == 'true'
+
+async def saved_messages_changed() -> None:
+    """
+    Advance the saved-messages version once a save has landed in the store,
+    invalidating cached pages and ETags on every worker sharing the state.
+    """
+    await shared_state.bump_version(SAVED_MESSAGES_VERSION)
+
+def create_log_pipeline() -> LogPipeline:
+    """
+    Build the log pipeline from LOG_LEVEL, LOG_FORMAT, LOG_INFO_SAMPLE_RATE,
+    LOG_QUEUE_SIZE, LOG_FILE and LOG_ASYNC.
+
+    Raises:
+        ValueError: If a setting is invalid
+    """
+    sample_rate = float(os.environ.get('LOG_INFO_SAMPLE_RATE', '1.0'))
+    if not 0.0 <= sample_rate <= 1.0:
+        raise ValueError(f"LOG_INFO_SAMPLE_RATE must be between 0 and 1: {sample_rate}")
+    return LogPipeline(
+        level=os.environ.get('LOG_LEVEL', 'INFO'),
+        json_format=os.environ.get('LOG_FORMAT', 'json') == 'json',
+        sample_rate=sample_rate,
+        queue_size=int(os.environ.get('LOG_QUEUE_SIZE', '10000')),
+        path=os.environ.get('LOG_FILE') or None,
+        asynchronous=env_flag('LOG_ASYNC', 'true')
+    )
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """
+    Build the response cache selected by RESPONSE_CACHE: off, memory, or mongo
+    (shared by all workers).
+    """
+    kind = os.environ.get('RESPONSE_CACHE', 'off').lower()
+    if kind == 'memory':
+        backend = MemoryCacheBackend(max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', '1000000')))
+    elif kind == 'mongo' and db is not None:
+        backend = MongoCacheBackend(db.message_cache)
+    else:
+        if kind != 'off':
+            logger.warning("Response cache '%s' is not available; caching is disabled", kind)
+        return None
+    return ResponseCache(
+        backend,
+        prompt_version=prompts.primary.version,
+        ttl=float(os.environ.get('RESPONSE_CACHE_TTL', '3600')),
+        max_entries_per_key=int(os.environ.get('RESPONSE_CACHE_ENTRIES_PER_KEY', '8')),
+        min_entries=int(os.environ.get('RESPONSE_CACHE_MIN_ENTRIES', '3')),
+        refresh_rate=float(os.environ.get('RESPONSE_CACHE_REFRESH_RATE', '0.2'))
+    )
+
+def connect_database() -> None:
+    global client, db, index_manager, message_store, message_corpus, write_behind
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    # MongoDB connection; the globals are only set once the configuration is
+    # valid, so a bad setting leaves the database routes at 503
+    mongo = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    database = mongo[os.environ['DB_NAME']]
+
+    # Saved-message storage layout: "legacy" documents or "compact" (see migrate_storage.py)
+    layout = os.environ.get('MESSAGE_STORAGE', 'legacy')
+    try:
+        store = create_message_store(database, layout)
+    except ValueError:
+        mongo.close()
+        raise
+    client, db, message_store = mongo, database, store
+
+    # Offline-generated corpus (see prewarm.py), served before calling the LLM
+    if env_flag('CORPUS_ENABLED'):
+        message_corpus = MessageCorpus(db.message_corpus, prompts.primary.version)
+
+    # Indexes required by the endpoints
+    index_manager = IndexManager(db, strict=env_flag('MONGO_INDEXES_STRICT'), layout=layout)
 
-# Initialize message generation service
-message_service = MessageGenerationService()
+    # Optional write-behind batching for POST /api/save-message
+    if env_flag('SAVE_WRITE_BEHIND'):
+        write_behind = WriteBehindQueue(
+            message_store,
+            max_queue=int(os.environ.get('SAVE_WRITE_BEHIND_MAX_QUEUE', '1000')),
+            batch_size=int(os.environ.get('SAVE_WRITE_BEHIND_BATCH_SIZE', '100')),
+            flush_interval=float(os.environ.get('SAVE_WRITE_BEHIND_FLUSH_INTERVAL', '0.05')),
+            on_flush=saved_messages_changed,
+            max_retries=int(os.environ.get('SAVE_WRITE_BEHIND_RETRIES', '3'))
+        )
+
+async def start_llm() -> None:
+    """
+    Import the LLM stack and start the message service in the background, so
+    the worker can serve requests (with fallback messages) while it loads.
+    """
+    global message_service, message_pool
+    try:
+        # The provider SDKs are heavy to import; keep that off the event loop
+        await asyncio.to_thread(importlib.import_module, "emergentintegrations.llm.chat")
+
+        service = MessageGenerationService(shared_state=shared_state, prompts=prompts)
+        await service.start()
+    except Exception as e:
+        startup_errors["llm"] = str(e)
+        logger.error("LLM service failed to start: %s", e)
+        return
+
+    # Pool of pre-generated messages per (emotion, language), refilled in the background
+    if env_flag('MESSAGE_POOL_ENABLED', 'true'):
+        pool = MessagePool(
+            service,
+            state=shared_state,
+            namespace=prompts.primary.version,
+            min_depth=int(os.environ.get('MESSAGE_POOL_MIN_DEPTH', '2')),
+            max_depth=int(os.environ.get('MESSAGE_POOL_MAX_DEPTH', '5')),
+            concurrency=int(os.environ.get('MESSAGE_POOL_CONCURRENCY', '4'))
+        )
+        pool.warm(PROMPT_PAIRS)
+        await pool.start()
+        message_pool = pool
+
+    message_service = service
+    if not service.client.streams_tokens:
+        startup_errors["stream"] = "LLM_API_BASE is not set; streamed messages arrive as one chunk"
+        logger.warning("LLM_API_BASE is not set; streamed messages arrive as one chunk")
+    logger.info("LLM service ready")
+
+    await measure_prompt_tokens()
+
+async def measure_prompt_tokens() -> None:
+    """
+    Measure the input tokens per message of each template in use, for
+    /metrics. Best effort, once the service is ready: loading the tokenizer may
+    download its vocabulary without a timeout, so it runs on a daemon thread
+    that neither readiness nor shutdown waits for.
+    """
+    loop = asyncio.get_running_loop()
+    for template in prompts.templates():
+        measured = loop.create_future()
+
+        def measure(template=template, measured=measured):
+            try:
+                outcome = (measured.set_result, template.prompt_tokens(PROMPT_PAIRS))
+            except Exception as e:
+                outcome = (measured.set_exception, e)
+            try:
+                loop.call_soon_threadsafe(lambda: measured.done() or outcome[0](outcome[1]))
+            except RuntimeError:
+                # The event loop closed while the tokenizer was loading
+                pass
+
+        threading.Thread(target=measure, name="prompt-tokens", daemon=True).start()
+        try:
+            tokens = await measured
+        except Exception as e:
+            logger.warning("Prompt %s could not be measured: %s", template.version, e)
+            continue
+        logger.info("Prompt %s: %.1f input tokens per message", template.version, tokens)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global log_pipeline, prompts, single_flight, response_cache, saved_pages, shared_state, message_service, message_pool
+
+    # Logs are formatted and written by a listener thread, off the event loop
+    try:
+        log_pipeline = create_log_pipeline()
+        log_error = None
+    except ValueError as e:
+        log_pipeline = LogPipeline(path=os.environ.get('LOG_FILE') or None)
+        log_error = e
+    log_pipeline.start()
+    if log_error is not None:
+        startup_errors["logging"] = str(log_error)
+        logger.error("Logging configuration falls back to the defaults: %s", log_error)
+
+    # Prompt templates: PROMPT_VERSION, plus an optional A/B variant
+    try:
+        prompts = create_prompt_selector()
+    except ValueError as e:
+        startup_errors["prompts"] = str(e)
+        logger.error("Prompt configuration falls back to the default: %s", e)
+        prompts = PromptSelector()
+
+    try:
+        connect_database()
+    except Exception as e:
+        startup_errors["database"] = str(e)
+        logger.error("Database is not configured: %s", e)
+
+    # State shared by workers (rate limits, message pool): in-process by
+    # default, or in Mongo when several workers or hosts serve the API
+    try:
+        shared_state = create_shared_state(os.environ.get('SHARED_STATE', 'local'), db)
+    except ValueError as e:
+        startup_errors["shared_state"] = str(e)
+        logger.error("Shared state falls back to local: %s", e)
+        shared_state = create_shared_state('local')
+
+    # Index builds can be slow on a large collection; run them in the background
+    # (strict mode keeps the affected routes at 503 until they finish)
+    background = []
+    if index_manager is not None:
+        background.append(asyncio.create_task(index_manager.ensure_indexes()))
+    if write_behind is not None:
+        await write_behind.start()
+
+    # Opt-in coalescing of concurrent identical generate-message calls
+    if env_flag('GENERATE_SINGLE_FLIGHT'):
+        single_flight = SingleFlight()
+
+    response_cache = create_response_cache()
+
+    # Serialized saved-messages pages, kept until the next save
+    saved_pages_entries = int(os.environ.get('SAVED_MESSAGES_CACHE_ENTRIES', '64'))
+    if saved_pages_entries > 0:
+        saved_pages = PageCache(max_entries=saved_pages_entries)
+
+    background.append(asyncio.create_task(start_llm()))
+
+    yield
+
+    # Graceful drain. The server has stopped accepting requests and finished
+    # the in-flight ones; let pool refills already sent upstream complete,
+    # then flush queued saves before closing connections.
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    if message_pool is not None:
+        await message_pool.stop(timeout=float(os.environ.get('DRAIN_TIMEOUT', '10')))
+        message_pool = None
+    if write_behind is not None:
+        await write_behind.stop()
+    if message_service is not None:
+        await message_service.close()
+        message_service = None
+    if client is not None:
+        client.close()
+    log_pipeline.stop()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+def too_many_requests(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+def require_db(route: str):
+    """
+    Build a dependency that rejects a database route when Mongo or its indexes are unavailable.
+    """
+    async def check_db():
+        if db is None or message_store is None or index_manager is None:
+            raise HTTPException(status_code=503, detail="Database is not available")
+        index_manager.check(route)
+    return check_db
 
 @api_router.get("/")
 async def root():
-    return {"message": "MoodMate API is running"}
+    return Response(ROOT_BODY, media_type="application/json")
+
+@api_router.get("/health/live")
+async def liveness():
+    """
+    Liveness probe: the worker process is up and its event loop is responsive.
+    """
+    return Response(LIVE_BODY, media_type="application/json")
+
+@api_router.get("/health/ready")
+async def readiness():
+    """
+    Readiness probe: reports whether the database is reachable and whether the
+    service can generate messages with the LLM (rather than only fallbacks).
+    """
+    database = False
+    if db is not None:
+        try:
+            await asyncio.wait_for(db.command("ping"), timeout=1.0)
+            database = True
+        except Exception as e:
+            logger.warning("Readiness database ping failed: %s", e)
+
+    llm = message_service is not None
+    body = {
+        "ready": database and llm,
+        "database": database,
+        "llm": llm,
+        "errors": startup_errors
+    }
+    return ORJSONResponse(body, status_code=200 if body["ready"] else 503)
+
+async def take_ready(emotion: str, language: str) -> Optional[str]:
+    """
+    Return a message that needs no LLM call: from the pool if one is ready,
+    then from the offline corpus. Returns None when neither has one.
+    """
+    if message_pool is not None:
+        text = await message_pool.take(emotion, language)
+        if text is not None:
+            CACHE_HITS.inc("pool", *metric_labels(emotion, language))
+            return text
+
+    if message_corpus is not None:
+        with phase("db", "corpus"):
+            text = await message_corpus.sample(emotion, language)
+        if text is not None:
+            CACHE_HITS.inc("corpus", *metric_labels(emotion, language))
+            return text
+
+    return None
+
+async def generate_text(emotion: str, language: str) -> tuple[str, str]:
+    """
+    Produce one message: from the pool or corpus if one is ready, then the
+    response cache, otherwise from the LLM, or the fallback message while the
+    LLM service is unavailable.
+
+    Returns:
+        (message, prompt version); the pool, corpus and cache hold messages of
+        the primary prompt version only
+    """
+    version = prompts.primary.version
+
+    # Serve a pre-generated message if one is ready
+    text = await take_ready(emotion, language)
+    if text is not None:
+        return text, version
+
+    service = message_service
+    if service is None:
+        FALLBACKS.inc(*metric_labels(emotion, language))
+        return fallback_message(language), version
+
+    # Then a recent output from the response cache
+    if response_cache is not None:
+        text = await response_cache.get(emotion, language)
+        if text is not None:
+            CACHE_HITS.inc("response_cache", *metric_labels(emotion, language))
+            return text, version
+
+    # Otherwise generate message using AI, sharing the call with identical
+    # in-flight requests when single-flight mode is on
+    async def generate():
+        text, version = await service.generate_message(emotion=emotion, language=language)
+        # Cached once per upstream call, not once per coalesced caller; outputs
+        # of an A/B variant are not cached under the primary version
+        if response_cache is not None and version == response_cache.prompt_version and text != fallback_message(language):
+            await response_cache.put(emotion, language, text)
+        return text, version
+
+    if single_flight is not None:
+        return await single_flight.do((emotion, language), generate)
+    return await generate()
 
 @api_router.post("/generate-message", response_model=MessageGenerateResponse)
 async def generate_message(request: MessageGenerateRequest):
@@ -49,84 +456,328 @@ async def generate_message(request: MessageGenerateRequest):
     Generate an empathetic motivational message based on emotion and language.
     """
     try:
-        logger.info(f"Generating message for emotion={request.emotion}, language={request.language}")
-        
-        # Generate message using AI
-        generated_text = await message_service.generate_message(
-            emotion=request.emotion,
-            language=request.language
+        generated_text, prompt_version = await generate_text(request.emotion, request.language)
+
+        with phase("validation", "generate-message"):
+            response = MessageGenerateResponse(
+                message=generated_text,
+                emotion=request.emotion,
+                language=request.language,
+                prompt_version=prompt_version
+            )
+
+        logger.info(
+            "Generated message for emotion=%s, language=%s", request.emotion, request.language,
+            extra={"emotion": request.emotion, "language": request.language, "prompt_version": prompt_version}
         )
-        
+        return response
+
+    except AdmissionRejected as e:
+        raise too_many_requests(e)
+
+    except Exception as e:
+        ERRORS.inc("/api/generate-message", *metric_labels(request.emotion, request.language))
+        logger.error("Error in generate_message: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to generate message: {str(e)}")
+
+@api_router.post("/generate-message/stream")
+async def generate_message_stream(request: MessageGenerateRequest):
+    """
+    Stream a generated message as Server-Sent Events.
+
+    Emits `token` events with text chunks as the LLM produces them. If the stream
+    breaks partway, a `fallback` event carries the complete fallback message that
+    replaces the partial text. The closing `done` event carries the full
+    MessageGenerateResponse.
+    """
+    async def events():
+        # A pre-generated message is sent in one chunk
+        template = prompts.primary
+        text = await take_ready(request.emotion, request.language)
+        if text is not None:
+            yield sse_event("token", json.dumps({"text": text}, ensure_ascii=False))
+        else:
+            chunks = []
+            try:
+                if message_service is None:
+                    raise RuntimeError("LLM service is not ready")
+                template = prompts.choose()
+                async for chunk in message_service.stream_message(request.emotion, request.language, template):
+                    chunks.append(chunk)
+                    yield sse_event("token", json.dumps({"text": chunk}, ensure_ascii=False))
+                text = "".join(chunks).strip()
+                if not text:
+                    raise ValueError("Empty response from LLM")
+                PROMPT_OUTCOMES.inc(template.version, "generated")
+            except Exception as e:
+                logger.error("Error in generate_message_stream: %s", e)
+                FALLBACKS.inc(*metric_labels(request.emotion, request.language))
+                PROMPT_OUTCOMES.inc(template.version, "fallback")
+                text = fallback_message(request.language)
+                yield fallback_event(request.language)
+
         response = MessageGenerateResponse(
-            message=generated_text,
+            message=text,
             emotion=request.emotion,
-            language=request.language
+            language=request.language,
+            prompt_version=template.version
         )
-        
-        logger.info(f"Successfully generated message: {generated_text[:50]}...")
-        return response
-        
+        yield sse_event("done", response.model_dump_json())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/generate-messages", response_model=MessagesGenerateResponse)
+async def generate_messages(request: MessagesGenerateRequest):
+    """
+    Generate several messages at once, either for a list of (emotion, language)
+    pairs or for one pair with a count.
+    """
+    try:
+        pairs = request.pairs()
+        logger.info("Generating %d messages", len(pairs), extra={"count": len(pairs)})
+
+        # Serve what we can from the pre-generated pool
+        texts = [None] * len(pairs)
+        versions = [prompts.primary.version] * len(pairs)
+        if message_pool is not None:
+            texts = [await message_pool.take(emotion, language) for emotion, language in pairs]
+            for (emotion, language), text in zip(pairs, texts):
+                if text is not None:
+                    CACHE_HITS.inc("pool", *metric_labels(emotion, language))
+
+        # Then from the offline corpus, with distinct messages for repeated pairs
+        if message_corpus is not None:
+            wanted: dict[tuple[str, str], list[int]] = {}
+            for i, text in enumerate(texts):
+                if text is None:
+                    wanted.setdefault(pairs[i], []).append(i)
+            with phase("db", "corpus"):
+                samples = await asyncio.gather(*(
+                    message_corpus.sample_many(emotion, language, len(indices))
+                    for (emotion, language), indices in wanted.items()
+                ))
+            for ((emotion, language), indices), sampled in zip(wanted.items(), samples):
+                for i, text in zip(indices, sampled):
+                    texts[i] = text
+                    CACHE_HITS.inc("corpus", *metric_labels(emotion, language))
+
+        # Generate the rest with batched LLM calls
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            version = prompts.primary.version
+            if message_service is not None:
+                generated, version = await message_service.generate_messages([pairs[i] for i in missing])
+            else:
+                generated = []
+                for i in missing:
+                    FALLBACKS.inc(*metric_labels(*pairs[i]))
+                    generated.append(fallback_message(pairs[i][1]))
+            for i, text in zip(missing, generated):
+                texts[i] = text
+                versions[i] = version
+
+        with phase("validation", "generate-messages"):
+            return MessagesGenerateResponse(messages=[
+                MessageGenerateResponse(message=text, emotion=emotion, language=language, prompt_version=version)
+                for (emotion, language), text, version in zip(pairs, texts, versions)
+            ])
+
+    except AdmissionRejected as e:
+        raise too_many_requests(e)
+
     except Exception as e:
-        logger.error(f"Error in generate_message: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate message: {str(e)}")
+        ERRORS.inc("/api/generate-messages", "other", "other")
+        logger.error("Error in generate_messages: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to generate messages: {str(e)}")
 
-@api_router.post("/save-message", response_model=SaveMessageResponse)
+@api_router.post(
+    "/save-message",
+    response_model=SaveMessageResponse,
+    dependencies=[Depends(require_db("save-message"))]
+)
 async def save_message(request: SaveMessageRequest):
     """
     Save a generated message to the database.
     """
     try:
-        saved_msg = SavedMessage(
-            emotion=request.emotion,
-            language=request.language,
-            text=request.message
-        )
-        
-        # Save to MongoDB
-        result = await db.saved_messages.insert_one(saved_msg.dict())
-        
-        logger.info(f"Saved message with id={saved_msg.id}")
-        
+        with phase("validation", "save-message"):
+            saved_msg = SavedMessage(
+                emotion=request.emotion,
+                language=request.language,
+                text=request.message,
+                prompt_version=request.prompt_version
+            )
+
+        # Queue for a batched write when write-behind is on; write directly
+        # when it is off or the queue is full
+        document = saved_msg.dict()
+        if write_behind is None or not write_behind.offer(document):
+            with phase("db", "insert"):
+                await message_store.insert_one(document)
+            await saved_messages_changed()
+
+        logger.info("Saved message with id=%s", saved_msg.id, extra={"message_id": saved_msg.id})
+
         return SaveMessageResponse(
             id=saved_msg.id,
             message="Message saved successfully"
         )
-        
+
     except Exception as e:
-        logger.error(f"Error in save_message: {str(e)}")
+        ERRORS.inc("/api/save-message", *metric_labels(request.emotion, request.language))
+        logger.error("Error in save_message: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to save message: {str(e)}")
 
-@api_router.get("/saved-messages", response_model=SavedMessagesResponse)
-async def get_saved_messages():
+@api_router.get(
+    "/saved-messages",
+    response_model=SavedMessagesResponse,
+    dependencies=[Depends(require_db("saved-messages"))]
+)
+async def get_saved_messages(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    emotion: Optional[str] = None,
+    language: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
     """
-    Retrieve all saved messages (limited to last 50).
+    Retrieve saved messages, newest first, one page at a time.
+
+    Pass the returned next_cursor back as `cursor` to fetch the following page.
+    Results can be filtered by emotion and/or language.
+
+    Pages carry an ETag derived from the saved-messages version, which only
+    changes when a save lands. A matching If-None-Match is answered with 304,
+    and an unchanged page is served from its cached bytes, both without
+    querying the collection.
     """
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        # Get last 50 messages, sorted by timestamp descending
-        cursor = db.saved_messages.find().sort("timestamp", -1).limit(50)
-        messages = await cursor.to_list(length=50)
-        
-        saved_messages = [SavedMessage(**msg) for msg in messages]
-        
-        logger.info(f"Retrieved {len(saved_messages)} saved messages")
-        
-        return SavedMessagesResponse(messages=saved_messages)
-        
+        # Read the version before the page, so a save landing in between can
+        # only make the page newer than its ETag, never older
+        key = (message_store.collection_name, limit, cursor, emotion, language)
+        with phase("db", "version"):
+            version = await shared_state.version(SAVED_MESSAGES_VERSION)
+        tag = etag(version, *key)
+        headers = {"ETag": tag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, tag):
+            NOT_MODIFIED.inc("/api/saved-messages")
+            return Response(status_code=304, headers=headers)
+
+        body = saved_pages.get(key, version) if saved_pages is not None else None
+        if body is None:
+            # Fetch one extra document to know whether another page exists
+            with phase("db", "find"):
+                messages = await message_store.page(emotion, language, after, limit + 1)
+
+            next_cursor = None
+            if len(messages) > limit:
+                messages = messages[:limit]
+                next_cursor = encode_cursor(messages[-1]["timestamp"], messages[-1]["id"])
+
+            # Fast path: the store returns response-shaped rows, so serialize them
+            # directly instead of re-validating each one through SavedMessage
+            with phase("serialization", "saved-messages"):
+                body = orjson.dumps({"messages": messages, "next_cursor": next_cursor})
+            if saved_pages is not None:
+                saved_pages.put(key, version, body)
+
+            logger.info("Retrieved %d saved messages", len(messages))
+
+        return Response(body, media_type="application/json", headers=headers)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error in get_saved_messages: {str(e)}")
+        ERRORS.inc("/api/saved-messages", *metric_labels(emotion or "", language or ""))
+        logger.error("Error in get_saved_messages: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve messages: {str(e)}")
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text-format metrics for this worker.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@REGISTRY.collector
+def component_gauges():
+    """
+    Report the counters kept by the pool, caches, queues and LLM guards as gauges.
+    """
+    if message_pool is not None:
+        stats = message_pool.stats()
+        for name in ("hits", "misses", "errors", "refill_errors"):
+            yield f"moodmate_pool_{name}", f"Message pool {name}", {}, stats[name]
+        for key, depth in stats["depth"].items():
+            yield "moodmate_pool_depth", "Ready messages per emotion/language", {"key": key}, depth
+    if single_flight is not None:
+        for name, value in single_flight.stats().items():
+            yield f"moodmate_single_flight_{name}", f"Single-flight {name}", {}, value
+    if response_cache is not None:
+        for name, value in response_cache.stats().items():
+            if isinstance(value, (int, float)):
+                yield f"moodmate_response_cache_{name}", f"Response cache {name}", {}, value
+    if message_corpus is not None:
+        for name, value in message_corpus.stats().items():
+            yield f"moodmate_corpus_{name}", f"Message corpus {name}", {}, value
+    if log_pipeline is not None:
+        for name, value in log_pipeline.stats().items():
+            yield f"moodmate_log_{name}", f"Log pipeline {name}", {}, value
+    if saved_pages is not None:
+        for name, value in saved_pages.stats().items():
+            yield f"moodmate_saved_pages_{name}", f"Saved-messages page cache {name}", {}, value
+    if write_behind is not None:
+        for name, value in write_behind.stats().items():
+            yield f"moodmate_write_behind_{name}", f"Write-behind queue {name}", {}, value
+    if message_service is not None:
+        stats = message_service.stats()
+        for name in ("latency_p50_seconds", "latency_p95_seconds", "timeouts", "hedges"):
+            if stats[name] is not None:
+                yield f"moodmate_llm_{name}", f"LLM {name}", {}, stats[name]
+        # Family by family, so each metric's samples stay together in the output
+        backend_gauges = (
+            ("moodmate_llm_backend_latency_seconds", "Moving average of LLM latency per backend",
+             lambda routing: routing["latency_seconds"]),
+            ("moodmate_llm_backend_error_rate", "Moving average of LLM error rate per backend",
+             lambda routing: routing["error_rate"]),
+            ("moodmate_llm_breaker_open", "1 while the backend's circuit breaker is not closed",
+             lambda routing: routing["breaker"]["state"] != "closed"),
+            ("moodmate_llm_breaker_short_circuited", "Calls short-circuited by the backend's breaker",
+             lambda routing: routing["breaker"]["short_circuited"])
+        )
+        for name, help, value in backend_gauges:
+            for backend, routing in stats["backends"].items():
+                if value(routing) is not None:
+                    yield name, help, {"backend": backend}, value(routing)
+        for name, value in stats["admission"].items():
+            yield f"moodmate_llm_admission_{name}", f"LLM admission {name}", {}, value
+    if prompts is not None:
+        for template in prompts.templates():
+            share = 100 - prompts.variant_percent if template is prompts.primary else prompts.variant_percent
+            yield "moodmate_prompt_traffic_percent", "Share of LLM calls per prompt version", {"prompt_version": template.version}, share
+            if template.tokens is not None:
+                yield "moodmate_prompt_tokens", "Mean input tokens per message", {"prompt_version": template.version}, template.tokens
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
-)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+)
\ No newline at end of file
@@ -0,0 +1,175 @@
+import os
+import socket
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+def worker_id() -> str:
+    """
+    Identify this worker process across hosts, for lease ownership.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class LocalStateBackend:
+    """
+    State shared by the tasks of a single worker process: fixed-window
+    counters, leases, bounded queues of ready messages, and data versions.
+    """
+
+    def __init__(self):
+        self._counters: dict[str, tuple[int, int]] = {}
+        self._leases: dict[str, tuple[str, float]] = {}
+        self._queues: dict[str, deque] = {}
+        # Versions start from the clock so a restarted worker never reissues an old version
+        self._versions: dict[str, int] = {}
+        self._initial_version = time.time_ns()
+
+    async def incr(self, key: str, window: float) -> tuple[int, float]:
+        """
+        Count one event in the current `window`-second window.
+
+        Returns:
+            (events in this window so far, seconds until the window ends)
+        """
+        now = time.time()
+        bucket = int(now // window)
+        current, count = self._counters.get(key, (bucket, 0))
+        count = count + 1 if current == bucket else 1
+        self._counters[key] = (bucket, count)
+        return count, (bucket + 1) * window - now
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Take or renew the named lease for ttl seconds; False if someone else holds it.
+        """
+        now = time.monotonic()
+        holder = self._leases.get(name)
+        if holder is not None and holder[0] != owner and holder[1] > now:
+            return False
+        self._leases[name] = (owner, now + ttl)
+        return True
+
+    async def release_lease(self, name: str, owner: str) -> None:
+        holder = self._leases.get(name)
+        if holder is not None and holder[0] == owner:
+            del self._leases[name]
+
+    async def push(self, key: str, value: str, max_len: int) -> bool:
+        """
+        Append a value to the named queue unless it is full or already holds it.
+        """
+        queue = self._queues.setdefault(key, deque())
+        if len(queue) >= max_len or value in queue:
+            return False
+        queue.append(value)
+        return True
+
+    async def pop(self, key: str) -> Optional[str]:
+        """
+        Remove and return the oldest value in the named queue, or None if it is empty.
+        """
+        queue = self._queues.get(key)
+        return queue.popleft() if queue else None
+
+    async def length(self, key: str) -> int:
+        return len(self._queues.get(key, ()))
+
+    async def version(self, key: str) -> int:
+        """
+        Return the current version of the named data set.
+        """
+        return self._versions.get(key, self._initial_version)
+
+    async def bump_version(self, key: str) -> int:
+        """
+        Advance the named data set's version after it changed; returns the new version.
+        """
+        self._versions[key] = self._versions.get(key, self._initial_version) + 1
+        return self._versions[key]
+
+class MongoStateBackend:
+    """
+    The same state kept in Mongo, shared by every worker and host: counters,
+    leases (expired by a TTL index) and versions in `shared_state`, queues in
+    `shared_queue`.
+    """
+
+    def __init__(self, db):
+        self.state = db.shared_state
+        self.queue = db.shared_queue
+
+    async def incr(self, key: str, window: float) -> tuple[int, float]:
+        now = time.time()
+        bucket = int(now // window)
+        document = await self.state.find_one_and_update(
+            {"_id": f"counter:{key}:{bucket}"},
+            {
+                "$inc": {"count": 1},
+                "$setOnInsert": {"expires_at": datetime.utcnow() + timedelta(seconds=2 * window)}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return document["count"], (bucket + 1) * window - now
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = datetime.utcnow()
+        try:
+            # Matches only a free, expired or own lease; otherwise the upsert
+            # collides with the holder's document on _id
+            await self.state.update_one(
+                {"_id": f"lease:{name}", "$or": [{"expires_at": {"$lte": now}}, {"owner": owner}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def release_lease(self, name: str, owner: str) -> None:
+        await self.state.delete_one({"_id": f"lease:{name}", "owner": owner})
+
+    async def push(self, key: str, value: str, max_len: int) -> bool:
+        # The length check is not atomic with the insert; concurrent pushes can
+        # overshoot max_len slightly, which only means a few extra ready messages
+        if await self.queue.count_documents({"key": key}) >= max_len:
+            return False
+        await self.queue.insert_one({"key": key, "value": value, "created_at": datetime.utcnow()})
+        return True
+
+    async def pop(self, key: str) -> Optional[str]:
+        document = await self.queue.find_one_and_delete({"key": key}, sort=[("created_at", 1)])
+        return document["value"] if document is not None else None
+
+    async def length(self, key: str) -> int:
+        return await self.queue.count_documents({"key": key})
+
+    async def version(self, key: str) -> int:
+        # A point read by _id; version documents have no expires_at and never expire
+        document = await self.state.find_one({"_id": f"version:{key}"}, {"value": 1})
+        return document["value"] if document is not None else 0
+
+    async def bump_version(self, key: str) -> int:
+        document = await self.state.find_one_and_update(
+            {"_id": f"version:{key}"},
+            {"$inc": {"value": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return document["value"]
+
+def create_shared_state(kind: str, db=None):
+    """
+    Build the shared-state backend named by SHARED_STATE ("local" or "mongo").
+    """
+    if kind == "local":
+        return LocalStateBackend()
+    if kind == "mongo":
+        if db is None:
+            raise ValueError("SHARED_STATE=mongo requires a database connection")
+        return MongoStateBackend(db)
+    raise ValueError(f"Unknown shared state backend: {kind}")
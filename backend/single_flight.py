@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one upstream call.
+
+    The first caller for a key starts the call; callers arriving while it is
+    still in flight wait for the same result instead of starting their own.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """
+        Run fn() for key, or join the call already in flight for key.
+
+        Args:
+            key: Identity of the call, e.g. (emotion, language)
+            fn: Zero-argument coroutine function performing the upstream call
+
+        Returns:
+            The shared result of fn(); its exception is raised to every waiter
+        """
+        future = self._calls.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        else:
+            self.coalesced += 1
+        # Shield so a disconnecting caller does not cancel the call for everyone else
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            future.exception()
+
+    def stats(self) -> dict:
+        """
+        Return upstream call and coalesced request counts with the dedup ratio.
+        """
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+            "dedup_ratio": self.coalesced / total if total else 0.0
+        }
\ No newline at end of file
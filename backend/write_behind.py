@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+from pymongo.errors import BulkWriteError
+from metrics import PHASE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of a document to tell the flush task to drain and exit
+_STOP = object()
+
+class WriteBehindQueue:
+    """
+    Bounded in-process queue that batches inserts into one collection (or any
+    store with the same insert_many signature).
+
+    Documents are acknowledged to the client as soon as they are queued; a
+    background task flushes them with insert_many(ordered=False) once
+    batch_size documents are waiting or flush_interval seconds have passed.
+    When the queue is full, offer() returns False and the caller writes
+    directly instead. on_flush, if given, is awaited after every flush that
+    wrote at least one document.
+
+    A flush that fails as a whole (e.g. a network error) is retried up to
+    max_retries times with exponential backoff from retry_backoff seconds,
+    since its documents were already acknowledged. Per-document write errors
+    are not retried.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        on_flush: Optional[Callable[[], Awaitable[None]]] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1
+    ):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._accepting = False
+
+        self.enqueued = 0
+        self.rejected = 0
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.max_batch = 0
+        self.ack_latency_total = 0.0
+        self.ack_latency_max = 0.0
+
+    async def start(self) -> None:
+        """
+        Start the background flush task on the running event loop.
+        """
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+        self._accepting = True
+
+    async def stop(self) -> None:
+        """
+        Stop accepting documents and flush everything still queued.
+        """
+        if self._task is None:
+            return
+        self._accepting = False
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def offer(self, document: dict) -> bool:
+        """
+        Queue a document for insertion.
+
+        Returns:
+            False if the queue is full or stopped; the caller must write the document itself
+        """
+        if not self._accepting:
+            return False
+        try:
+            self._queue.put_nowait((document, asyncio.get_running_loop().time()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drain anything queued before stop() was called
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i:i + self.batch_size])
+
+    async def _flush(self, batch: list) -> None:
+        documents = [document for document, _ in batch]
+        inserted = 0
+        for attempt in range(self.max_retries + 1):
+            try:
+                with PHASE_LATENCY.time("db", "insert_many"):
+                    await self.collection.insert_many(documents, ordered=False)
+                inserted = len(documents)
+                break
+            except BulkWriteError as e:
+                # With ordered=False every document that could be written was written.
+                # On a retry, duplicate keys are documents an earlier attempt wrote.
+                inserted = e.details.get("nInserted", 0)
+                if attempt:
+                    inserted += sum(1 for error in e.details.get("writeErrors", []) if error.get("code") == 11000)
+                if inserted < len(documents):
+                    logger.error("Write-behind flush wrote %d/%d documents: %s", inserted, len(documents), e)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(
+                        "Write-behind flush of %d documents failed after %d attempts: %s",
+                        len(documents), attempt + 1, e
+                    )
+                    break
+                delay = self.retry_backoff * 2 ** attempt
+                logger.warning(
+                    "Write-behind flush of %d documents failed, retrying in %.2fs: %s", len(documents), delay, e
+                )
+                self.retries += 1
+                await asyncio.sleep(delay)
+        self.written += inserted
+        self.failed += len(documents) - inserted
+        if inserted and self.on_flush is not None:
+            try:
+                await self.on_flush()
+            except Exception as e:
+                logger.error("Write-behind flush callback failed: %s", e)
+        now = asyncio.get_running_loop().time()
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        for _, queued_at in batch:
+            latency = now - queued_at
+            self.ack_latency_total += latency
+            self.ack_latency_max = max(self.ack_latency_max, latency)
+
+    def stats(self) -> dict:
+        """
+        Return queue depth, batch-size and ack-latency counters.
+        """
+        flushed = self.written + self.failed
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+            "avg_batch_size": flushed / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "avg_ack_latency_seconds": self.ack_latency_total / flushed if flushed else 0.0,
+            "max_ack_latency_seconds": self.ack_latency_max
+        }
\ No newline at end of file
@@ -39,6 +39,7 @@ const MoodMate = () => {
   const [selectedEmotion, setSelectedEmotion] = useState('');
   const [selectedLanguage, setSelectedLanguage] = useState('');
   const [message, setMessage] = useState('');
+  const [promptVersion, setPromptVersion] = useState(null);
   const [isGenerating, setIsGenerating] = useState(false);
   const [isCopied, setIsCopied] = useState(false);
   const [savedMessages, setSavedMessages] = useState([]);
@@ -81,6 +82,7 @@ const MoodMate = () => {
       });
       
       setMessage(response.data.message);
+      setPromptVersion(response.data.prompt_version);
     } catch (error) {
       console.error('Error generating message:', error);
       toast({
@@ -111,7 +113,8 @@ const MoodMate = () => {
         await axios.post(`${API}/save-message`, {
           emotion: selectedEmotion,
           language: selectedLanguage,
-          message: message
+          message: message,
+          prompt_version: promptVersion
         });
         
         toast({
@@ -0,0 +1,192 @@
+import asyncio
+import sys
+
+import pytest
+
+from benchmarks import fake_llm
+from llm_router import LlmBackend, LlmRouter, parse_backends, parse_overrides
+from message_service import MessageGenerationService, fallback_message
+from resilience import CircuitBreaker
+
+def measured(name: str, latency: float, **kwargs) -> LlmBackend:
+    provider, model = name.split("/")
+    backend = LlmBackend(provider, model, **kwargs)
+    backend.record(True, latency)
+    return backend
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker(min_requests=1, open_seconds=60)
+    breaker.record(False)
+    return breaker
+
+@pytest.fixture
+def make_service(monkeypatch):
+    """
+    Build a MessageGenerationService whose backends are local fakes, keyed by
+    "provider/model" with their FakeLlmConfig.
+    """
+    def make(backends: dict, **env) -> MessageGenerationService:
+        # Registered through monkeypatch so the fake SDK does not outlive the test
+        modules = {}
+        fake_llm.install(fake_llm.FakeLlmConfig(latency_median=0.01, latency_sigma=0), backends, modules=modules)
+        for name, module in modules.items():
+            monkeypatch.setitem(sys.modules, name, module)
+        monkeypatch.setenv("EMERGENT_LLM_KEY", "test")
+        monkeypatch.setenv("LLM_BACKENDS", ",".join(backends))
+        monkeypatch.setenv("LLM_ROUTER_EXPLORE", "0")
+        for key, value in env.items():
+            monkeypatch.setenv(key, str(value))
+        return MessageGenerationService()
+    return make
+
+def fake(latency: float = 0.01, error_rate: float = 0.0) -> fake_llm.FakeLlmConfig:
+    return fake_llm.FakeLlmConfig(latency_median=latency, latency_sigma=0, error_rate=error_rate, seed=0)
+
+def test_route_orders_healthy_backends_by_expected_latency():
+    slow = measured("openai/slow", 0.8)
+    fast = measured("gemini/fast", 0.2)
+    flaky = measured("anthropic/flaky", 0.3)
+    for _ in range(5):
+        flaky.record(False)
+    router = LlmRouter([slow, fast, flaky], explore=0)
+
+    ordered, reason = router.route()
+
+    assert reason == "fastest"
+    assert ordered == [fast, slow, flaky]
+
+def test_route_single_backend():
+    backend = measured("openai/gpt-4o-mini", 0.5)
+    assert LlmRouter([backend]).route("English") == ([backend], "only")
+
+def test_route_tries_unmeasured_backend_first():
+    known = measured("openai/known", 0.2)
+    new = LlmBackend("gemini", "new")
+    ordered, _ = LlmRouter([known, new], explore=0).route()
+    assert ordered[0] is new
+
+def test_route_moves_fast_failing_backend_down():
+    good = LlmBackend("good", "m")
+    bad = LlmBackend("bad", "m")
+    router = LlmRouter([bad, good], explore=0)
+
+    # bad fails without a latency sample, the request fails over to good
+    bad.record(False)
+    good.record(True, 0.3)
+
+    ordered, _ = router.route()
+    assert ordered == [good, bad]
+    assert bad.latency is None
+
+def test_route_puts_open_breakers_last():
+    fast = measured("gemini/fast", 0.1, breaker=open_breaker())
+    slow = measured("openai/slow", 0.9)
+    ordered, reason = LlmRouter([fast, slow], explore=0).route()
+    assert ordered == [slow, fast]
+    assert reason == "fastest"
+
+def test_route_language_overrides():
+    fast = measured("gemini/fast", 0.1)
+    pinned = measured("openai/pinned", 0.9)
+    router = LlmRouter([fast, pinned], overrides={"Japanese": ["openai/pinned"]}, explore=0)
+
+    assert router.route("Japanese") == ([pinned, fast], "override")
+    assert router.route("English") == ([fast, pinned], "fastest")
+
+def test_route_override_with_open_breaker_falls_back_to_fastest():
+    fast = measured("gemini/fast", 0.1)
+    pinned = measured("openai/pinned", 0.9, breaker=open_breaker())
+    router = LlmRouter([fast, pinned], overrides={"Japanese": ["openai/pinned"]}, explore=0)
+    assert router.route("Japanese") == ([fast, pinned], "fastest")
+
+def test_unknown_override_backend_is_rejected():
+    with pytest.raises(ValueError):
+        LlmRouter([LlmBackend("openai", "gpt-4o-mini")], overrides={"Japanese": ["gemini/missing"]})
+
+def test_parse_configuration():
+    assert parse_backends("openai/gpt-4o-mini, gemini/gemini-2.0-flash") == [
+        ("openai", "gpt-4o-mini"), ("gemini", "gemini-2.0-flash")
+    ]
+    assert parse_overrides("Japanese:gemini/a|openai/b, Hindi:openai/b") == {
+        "Japanese": ["gemini/a", "openai/b"], "Hindi": ["openai/b"]
+    }
+    with pytest.raises(ValueError):
+        parse_backends("openai")
+
+def test_send_skips_backend_with_open_breaker(make_service):
+    first, second = fake(), fake()
+    service = make_service({"openai/first": first, "gemini/second": second})
+    service.router.backends[0].breaker = open_breaker()
+
+    assert asyncio.run(service.request_message("Happy", "English"))
+    assert first.calls == 0
+    assert second.calls == 1
+
+def test_send_fails_over_to_next_backend(make_service):
+    failing, healthy = fake(error_rate=1.0), fake()
+    service = make_service({"openai/failing": failing, "gemini/healthy": healthy})
+
+    assert asyncio.run(service.request_message("Happy", "English"))
+    assert (failing.calls, healthy.calls) == (1, 1)
+    stats = service.router.stats()
+    assert stats["openai/failing"]["errors"] == 1
+    assert stats["gemini/healthy"]["successes"] == 1
+
+def test_send_stops_after_max_attempts(make_service):
+    backends = {"openai/a": fake(error_rate=1.0), "gemini/b": fake(error_rate=1.0), "anthropic/c": fake()}
+    service = make_service(backends, LLM_MAX_ATTEMPTS=2)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.request_message("Happy", "English"))
+    assert [config.calls for config in backends.values()] == [1, 1, 0]
+
+def test_generate_serves_static_fallback_when_every_backend_fails(make_service):
+    backends = {"openai/a": fake(error_rate=1.0), "gemini/b": fake(error_rate=1.0)}
+    service = make_service(backends)
+
+    text, _ = asyncio.run(service.generate_message("Happy", "Spanish"))
+
+    assert text == fallback_message("Spanish")
+    assert [config.calls for config in backends.values()] == [1, 1]
+
+def test_language_override_routes_service_calls(make_service):
+    fast, pinned = fake(), fake()
+    service = make_service(
+        {"gemini/fast": fast, "openai/pinned": pinned},
+        LLM_LANGUAGE_BACKENDS="Japanese:openai/pinned"
+    )
+
+    asyncio.run(service.request_message("Happy", "Japanese"))
+
+    assert (fast.calls, pinned.calls) == (0, 1)
+
+def test_rejected_streams_do_not_open_breaker(make_service, monkeypatch):
+    class AuthenticationError(Exception):
+        status_code = 401
+
+    async def reject(**kwargs):
+        raise AuthenticationError("invalid key for this endpoint")
+
+    service = make_service({"openai/gpt-4o-mini": fake()}, LLM_API_BASE="http://fake-llm.invalid")
+    monkeypatch.setattr(sys.modules["litellm"], "acompletion", reject)
+
+    async def stream():
+        async for _ in service.stream_message("Happy", "English"):
+            pass
+
+    for _ in range(12):
+        with pytest.raises(AuthenticationError):
+            asyncio.run(stream())
+
+    backend = service.router.backends[0]
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+    assert backend.errors == 0
+    assert asyncio.run(service.request_message("Happy", "English"))
+
+def test_stalled_backend_leaves_time_to_fail_over(make_service):
+    stalled, healthy = fake(latency=5), fake()
+    service = make_service({"openai/stalled": stalled, "gemini/healthy": healthy}, LLM_TIMEOUT=1)
+
+    assert service.attempt_timeout == 0.5
+    assert asyncio.run(service.request_message("Happy", "English"))
+    assert (stalled.calls, healthy.calls) == (1, 1)